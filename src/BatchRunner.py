@@ -0,0 +1,100 @@
+import argparse
+import csv
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from HeadlessSimulation import HeadlessSimulation
+from MapCache import MapCache
+
+# the columns of the results file, one row per flight
+RESULTS_FIELDS = ["map", "seed", "wall_pid_gains", "forward_pid_gains", "narrow_pid_gains",
+                  "coverage", "crashes", "sim_time", "returned_home", "time_to_return", "battery_at_home"]
+
+# the gains the drone flies with, see Drone.__init__
+DEFAULT_GAINS = {
+    "wall_pid_gains": (0.07, 0, 0.05, 5),
+    "forward_pid_gains": (1.6, 0, 0.03, 5),
+    "narrow_pid_gains": (0.03, 0, 0.03, 5),
+}
+
+# parses "P,I,D,max_I" into a gains tuple
+def parse_gains(text):
+    gains = tuple(float(value) for value in text.split(","))
+    if len(gains) != 4:
+        raise argparse.ArgumentTypeError(f"expected P,I,D,max_I but got '{text}'")
+    return gains
+
+def format_gains(gains):
+    return ",".join(f"{value:g}" for value in gains)
+
+# one flight of the sweep, runs in a worker process
+def run_flight(job):
+    map_path, seed, pid_gains, max_time, native_resolution = job
+    simulation = HeadlessSimulation(map_path, seed=seed, pid_gains=pid_gains, native_resolution=native_resolution)
+    stats = simulation.run(max_time=max_time)
+    return {
+        "map": os.path.basename(map_path),
+        "seed": seed,
+        "wall_pid_gains": format_gains(pid_gains["wall_pid_gains"]),
+        "forward_pid_gains": format_gains(pid_gains["forward_pid_gains"]),
+        "narrow_pid_gains": format_gains(pid_gains["narrow_pid_gains"]),
+        "coverage": f"{stats['coverage']:.4f}",
+        "crashes": stats["crashes"],
+        "sim_time": f"{stats['sim_time']:.2f}",
+        "returned_home": stats["returned_home"],
+        "time_to_return": f"{stats['time_to_return']:.2f}" if stats["returned_home"] else "",
+        "battery_at_home": f"{stats['battery']:.1f}" if stats["returned_home"] else "",
+    }
+
+# every combination of map x seed x gains of the three controllers
+def build_jobs(map_paths, seeds, wall_gains, forward_gains, narrow_gains, max_time, native_resolution=False):
+    jobs = []
+    for map_path, seed, wall, forward, narrow in itertools.product(map_paths, seeds, wall_gains, forward_gains, narrow_gains):
+        pid_gains = {"wall_pid_gains": wall, "forward_pid_gains": forward, "narrow_pid_gains": narrow}
+        jobs.append((map_path, seed, pid_gains, max_time, native_resolution))
+    return jobs
+
+# runs the jobs on a process pool and writes each result as soon as it is ready
+def run_batch(jobs, results_path, workers=None):
+    # preprocess every map once before the workers start, they all map the same cached files
+    map_cache = MapCache()
+    for map_path, native_resolution in sorted(set((job[0], job[4]) for job in jobs)):
+        if native_resolution:
+            map_cache.load_tiled(map_path, int(10 / 2.5))
+        else:
+            map_cache.load(map_path, 1366, 768, int(10 / 2.5))
+    with open(results_path, "w", newline="") as results_file:
+        writer = csv.DictWriter(results_file, fieldnames=RESULTS_FIELDS)
+        writer.writeheader()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for done, row in enumerate(executor.map(run_flight, jobs), start=1):
+                writer.writerow(row)
+                results_file.flush()
+                print(f"[{done}/{len(jobs)}] {row['map']} seed={row['seed']} coverage={row['coverage']} % crashes={row['crashes']}")
+
+
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    maps_folder = os.path.join(os.path.dirname(script_dir), 'maps')
+
+    parser = argparse.ArgumentParser(description="Sweep headless flights over maps x seeds x PID gains on all CPU cores")
+    parser.add_argument("--maps", nargs="+", default=None, help="map images (default: every map in the maps folder)")
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0], help="spawn point seeds")
+    parser.add_argument("--wall-gains", nargs="+", type=parse_gains, default=[DEFAULT_GAINS["wall_pid_gains"]],
+                        help="P,I,D,max_I of the wall distance controller")
+    parser.add_argument("--forward-gains", nargs="+", type=parse_gains, default=[DEFAULT_GAINS["forward_pid_gains"]],
+                        help="P,I,D,max_I of the forward distance controller")
+    parser.add_argument("--narrow-gains", nargs="+", type=parse_gains, default=[DEFAULT_GAINS["narrow_pid_gains"]],
+                        help="P,I,D,max_I of the narrow path controller")
+    parser.add_argument("--max-time", type=float, default=480, help="maximum simulated flight time in seconds")
+    parser.add_argument("--native", action="store_true", help="fly the maps at the size of their images instead of resizing them to 1366x768")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU core)")
+    parser.add_argument("--output", default="batch_results.csv", help="results file")
+    args = parser.parse_args()
+
+    map_paths = args.maps or sorted(os.path.join(maps_folder, f) for f in os.listdir(maps_folder) if f.endswith(('png', 'jpg', 'jpeg')))
+    jobs = build_jobs(map_paths, args.seeds, args.wall_gains, args.forward_gains, args.narrow_gains, args.max_time, args.native)
+    run_batch(jobs, args.output, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from PIL import Image
+from DistanceSensorArray import DistanceSensorArray
+from ExplorationMap import ExplorationMap
+from HeadlessSimulation import HeadlessSimulation
+from MapCache import MapCache
+from OccupancyGrid import OccupancyGrid
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_directory = os.path.dirname(script_dir)
+MAPS_FOLDER = os.path.join(parent_directory, 'maps')
+BASELINE_PATH = os.path.join(parent_directory, 'benchmarks', 'baseline.json')
+
+# metric -> True if a higher value is better
+METRICS = {
+    "map_load_ms": False,
+    "map_cached_load_ms": False,
+    "raycast_rays_per_second": True,
+    "headless_ticks_per_second": True,
+    "coverage_update_us": False,
+    "belief_update_us": False,
+    "flight_peak_memory_mb": False,
+}
+
+# the best of a few runs, the other runs are mostly noise from the rest of the machine
+def best_time(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+# opening, resizing and thresholding the map plus the structures the sensors and collisions need
+def bench_map_load(map_path, repeat):
+    def load():
+        grid = OccupancyGrid.from_image(Image.open(map_path).resize((1366, 768)))
+        grid.get_clearance()
+        grid.get_collision_mask(int(10 / 2.5))
+    return best_time(load, repeat) * 1000
+
+# loading the same map from the preprocessed maps cache, the first load fills the cache
+def bench_cached_map_load(map_path, repeat):
+    map_cache = MapCache()
+    map_cache.load(map_path, 1366, 768, int(10 / 2.5))
+    return best_time(lambda: map_cache.load(map_path, 1366, 768, int(10 / 2.5)), repeat) * 1000
+
+def bench_raycast(map_path, repeat, drones_count=1000, calls=50):
+    grid = OccupancyGrid.from_image(Image.open(map_path).resize((1366, 768)))
+    grid.get_clearance()
+    rng = random.Random(0)
+    positions = [(rng.uniform(0, grid.width), rng.uniform(0, grid.height)) for _ in range(drones_count)]
+    orientations = [rng.uniform(0, 360) for _ in range(drones_count)]
+    sensors = DistanceSensorArray(["forward", "backward", "leftward", "rightward"], drones_count)
+
+    def measure_all():
+        for _ in range(calls):
+            sensors.measure(grid, positions, orientations, int(10 / 2.5))
+    return calls * drones_count * len(sensors.directions) / best_time(measure_all, repeat)
+
+def bench_headless_ticks(map_path, repeat, flight_time=60):
+    # the simulation's construction (the map load) is measured by bench_map_load, only the flight is timed here
+    seconds = None
+    for _ in range(repeat):
+        simulation = HeadlessSimulation(map_path, seed=0)
+        start = time.perf_counter()
+        simulation.run(max_time=flight_time)
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    return simulation.ticks / seconds
+
+# the coverage of the left and right sensors at random free positions with the sensors' full range
+def bench_coverage_update(map_path, repeat, calls=2000):
+    simulation = HeadlessSimulation(map_path, seed=0)
+    rng = random.Random(0)
+    free_positions = simulation.map_matrix.get_free_positions(simulation.drone_radius)
+    poses = []
+    for _ in range(calls):
+        position = int(free_positions[rng.randrange(len(free_positions))])
+        poses.append(([position % simulation.map_width, position // simulation.map_width], rng.uniform(0, 360)))
+    simulation.drone.leftward_distance_sensor.distance = 300
+    simulation.drone.rightward_distance_sensor.distance = 300
+
+    def update_all():
+        simulation.coverage.clear()
+        for position, orientation in poses:
+            simulation.drone_pos = position
+            simulation.drone.orientation_sensor.update_orientation(orientation)
+            simulation.update_coverage()
+    return best_time(update_all, repeat) / calls * 1e6
+
+# one scan of the four distance sensors added to the drone's belief map, at random free positions
+def bench_belief_update(map_path, repeat, calls=2000):
+    grid = OccupancyGrid.from_image(Image.open(map_path).resize((1366, 768)))
+    grid.get_clearance()
+    drone_radius = int(10 / 2.5)
+    rng = random.Random(0)
+    free_positions = grid.get_free_positions(drone_radius)
+    sensors = DistanceSensorArray(["forward", "backward", "leftward", "rightward"])
+    scans = []
+    for _ in range(calls):
+        position = int(free_positions[rng.randrange(len(free_positions))])
+        position, orientation = [position % grid.width, position // grid.width], rng.uniform(0, 360)
+        sensors.measure(grid, [position], [orientation], drone_radius)
+        scans.append((position, orientation, sensors.ranges))
+    exploration_map = ExplorationMap(grid.width, grid.height)
+
+    def update_all():
+        exploration_map.clear()
+        for position, orientation, ranges in scans:
+            sensors.ranges = ranges
+            exploration_map.add_scan(sensors, position, orientation, drone_radius)
+    return best_time(update_all, repeat) / calls * 1e6
+
+def bench_flight_memory(map_path, flight_time=30):
+    tracemalloc.start()
+    HeadlessSimulation(map_path, seed=0).run(max_time=flight_time)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2 ** 20
+
+def run_benchmarks(map_paths, repeat):
+    results = {metric: {} for metric in METRICS}
+    for map_path in map_paths:
+        map_name = os.path.basename(map_path)
+        results["map_load_ms"][map_name] = bench_map_load(map_path, repeat)
+        results["map_cached_load_ms"][map_name] = bench_cached_map_load(map_path, repeat)
+        results["raycast_rays_per_second"][map_name] = bench_raycast(map_path, repeat)
+        results["headless_ticks_per_second"][map_name] = bench_headless_ticks(map_path, repeat)
+        results["coverage_update_us"][map_name] = bench_coverage_update(map_path, repeat)
+        results["belief_update_us"][map_name] = bench_belief_update(map_path, repeat)
+        results["flight_peak_memory_mb"][map_name] = bench_flight_memory(map_path)
+        print(f"{map_name}: " + ", ".join(f"{metric} {results[metric][map_name]:.1f}" for metric in METRICS))
+    return results
+
+# the metrics which got worse than the baseline by more than threshold (a fraction)
+def find_regressions(results, baseline, threshold):
+    regressions = []
+    for metric, higher_is_better in METRICS.items():
+        for map_name, value in results[metric].items():
+            baseline_value = baseline.get(metric, {}).get(map_name)
+            if baseline_value is None:
+                continue
+            if higher_is_better:
+                regressed = value < baseline_value * (1 - threshold)
+            else:
+                regressed = value > baseline_value * (1 + threshold)
+            if regressed:
+                regressions.append(f"{metric} on {map_name}: {value:.1f} (baseline {baseline_value:.1f})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the map loading, sensors, control loop, coverage, belief map and memory on the reference maps")
+    parser.add_argument("--maps", nargs="+", default=None, help="map images (default: every map in the maps folder)")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of every timing, the best one counts")
+    parser.add_argument("--threshold", type=float, default=0.5, help="allowed regression from the baseline, as a fraction (the timings of a shared machine swing a lot)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline results file")
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the new baseline")
+    args = parser.parse_args()
+
+    map_paths = args.maps or sorted(os.path.join(MAPS_FOLDER, f) for f in os.listdir(MAPS_FOLDER) if f.endswith(('png', 'jpg', 'jpeg')))
+    results = run_benchmarks(map_paths, args.repeat)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --update-baseline first")
+        return
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    regressions = find_regressions(results, baseline, args.threshold)
+    if regressions:
+        print(f"Regressions beyond {args.threshold:.0%}:")
+        for regression in regressions:
+            print("  " + regression)
+        sys.exit(1)
+    print(f"No regressions beyond {args.threshold:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import numpy as np
+from TiledArray import SparseTiledArray
+
+# CoverageMap class - a bitmap of the map's pixels which the drone's sensors already covered, with a running count.
+# on a tiled map the bitmap is sparse, only the tiles the sensors covered are allocated
+class CoverageMap:
+    def __init__(self, map_matrix, stamp_radius=2):
+        self.map_matrix = map_matrix
+        if map_matrix.is_tiled:
+            self.covered = SparseTiledArray(map_matrix.width, map_matrix.height, map_matrix.tile_size, bool, self.new_tile)
+        else:
+            self.covered = np.zeros((map_matrix.height, map_matrix.width), dtype=bool)
+        self.covered_count = 0
+        # the offsets of all the pixels within stamp_radius around a point
+        offsets = [(dx, dy) for dx in range(-stamp_radius, stamp_radius + 1) for dy in range(-stamp_radius, stamp_radius + 1)
+                   if dx * dx + dy * dy <= stamp_radius * stamp_radius]
+        self.stamp_dx = np.array([dx for dx, dy in offsets])
+        self.stamp_dy = np.array([dy for dx, dy in offsets])
+
+    '''
+    covers the free pixels within stamp_radius around every point (xs, ys) which is not covered yet.
+    returns the x's and y's of the pixels which were newly covered.
+    '''
+    def stamp(self, xs, ys):
+        not_covered = ~self.covered[ys, xs]
+        xs, ys = xs[not_covered], ys[not_covered]
+        stamp_xs = (xs[:, None] + self.stamp_dx[None, :]).ravel()
+        stamp_ys = (ys[:, None] + self.stamp_dy[None, :]).ravel()
+        inside = (stamp_xs >= 0) & (stamp_xs < self.map_matrix.width) & (stamp_ys >= 0) & (stamp_ys < self.map_matrix.height)
+        stamp_xs, stamp_ys = stamp_xs[inside], stamp_ys[inside]
+        new = (self.map_matrix.cells[stamp_ys, stamp_xs] == 0) & ~self.covered[stamp_ys, stamp_xs]
+        # a pixel can be in the stamps of a few points, count it once
+        new_pixels = np.unique(stamp_ys[new] * self.map_matrix.width + stamp_xs[new])
+        self.covered[new_pixels // self.map_matrix.width, new_pixels % self.map_matrix.width] = True
+        self.covered_count += len(new_pixels)
+        return new_pixels % self.map_matrix.width, new_pixels // self.map_matrix.width
+
+    def new_tile(self, tile_row, tile_column):
+        return np.zeros((self.map_matrix.tile_size, self.map_matrix.tile_size), dtype=bool)
+
+    def clear(self):
+        if isinstance(self.covered, SparseTiledArray):
+            self.covered.clear()
+        else:
+            self.covered[:] = False
+        self.covered_count = 0
+
+    # the covered pixels packed in bits, per allocated tile on a tiled map, for a snapshot
+    def get_state(self):
+        if isinstance(self.covered, SparseTiledArray):
+            bits = {key: np.packbits(tile) for key, tile in self.covered.tiles.items()}
+        else:
+            bits = np.packbits(self.covered)
+        return bits, self.covered_count
+
+    def set_state(self, state):
+        bits, self.covered_count = state
+        if isinstance(self.covered, SparseTiledArray):
+            size = self.map_matrix.tile_size
+            self.covered.tiles = {key: np.unpackbits(tile_bits, count=size * size).reshape(size, size).astype(bool)
+                                  for key, tile_bits in bits.items()}
+        else:
+            self.covered[:] = np.unpackbits(bits, count=self.covered.size).reshape(self.covered.shape).astype(bool)
@@ -0,0 +1,54 @@
+import numpy as np
+
+# DistanceSensorArray class - the distance sensors (beams) of many drones, all measured in one NumPy pass
+class DistanceSensorArray:
+    # the angle of every sensor direction relatively to the drone's angle
+    directions_angles = {
+        "forward": 0,
+        "backward": 180,
+        "leftward": 270,
+        "rightward": 90
+    }
+
+    def __init__(self, directions, drones_count=1, max_range=120):
+        self.directions = list(directions)
+        self.beam_angles = np.array([self.directions_angles[direction] for direction in self.directions], dtype=float)
+        self.max_range = max_range  # 3 meters in pixels (3 meters / 0.025 meters per pixel)
+        self.ranges = [[0] * len(self.directions) for _ in range(drones_count)]  # ranges[drone][beam] in cm
+
+    '''
+    measures all the beams of all the drones: positions is (N, 2), orientations is (N,) in degrees.
+    every ray starts at the drone's edge and steps along (x + dx * dist, y + dy * dist) for dist = 1, 2, ...,
+    max_range until it lands on an obstacle or outside the map. a pixel with clearance c guarantees the next c - 1
+    steps are free (every step moves to a pixel at most one pixel further away), so all the rays advance together,
+    each one jumping over the free pixels given by the map's clearance field. returns the (N, K) ranges in cm.
+    '''
+    def measure(self, map_matrix, positions, orientations, drone_radius):
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        orientations = np.asarray(orientations, dtype=float).reshape(-1)
+        angles = np.radians(orientations[:, None] + self.beam_angles[None, :])
+        dx = np.cos(angles).ravel()  # defind the x direction relatively to the drone's angle
+        dy = np.sin(angles).ravel()  # defind the y direction relatively to the drone's angle
+        drone_x = np.repeat(positions[:, 0], len(self.beam_angles))
+        drone_y = np.repeat(positions[:, 1], len(self.beam_angles))
+
+        sensor_x = np.where(dx < 0, drone_x - drone_radius, drone_x + drone_radius)
+        sensor_y = np.where(dy < 0, drone_y - drone_radius, drone_y + drone_radius)
+
+        clearance = map_matrix.get_clearance()
+        dist = np.ones(dx.shape, dtype=np.int64)
+        active = np.arange(dx.size)  # the rays which did not hit anything yet
+        while active.size:
+            ray_dist = dist[active]
+            nx = (sensor_x[active] + dx[active] * ray_dist).astype(np.int64)
+            ny = (sensor_y[active] + dy[active] * ray_dist).astype(np.int64)
+            inside = (nx >= 0) & (nx < map_matrix.width) & (ny >= 0) & (ny < map_matrix.height)
+            free_steps = np.zeros(active.size, dtype=np.int64)
+            free_steps[inside] = clearance[ny[inside], nx[inside]]
+            # found an obstacle or left the map - the ray stops at its current step
+            dist[active] = ray_dist + free_steps
+            active = active[(free_steps > 0) & (dist[active] <= self.max_range)]
+
+        ranges = np.minimum(dist, self.max_range).reshape(angles.shape) * 2.5  # Distance in cm
+        self.ranges = ranges.tolist()
+        return ranges
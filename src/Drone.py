@@ -1,43 +1,105 @@
 from IMU import IMU
 from BatterySensor import BatterySensor
 from DistanceSensor import DistanceSensor
+from DistanceSensorArray import DistanceSensorArray
+from ExplorationMap import ExplorationMap
+from FrontierPlanner import FrontierPlanner
 import math
 from OpticalFlow import OpticalFlow
+from PIDBank import PIDBank
 from PIDController import PIDController
+from ReturnPlanner import ReturnPlanner
+from Trail import Trail
 import time
    
 class Drone:
-    def __init__(self):
+    def __init__(self, clock=time.time, wall_pid_gains=(0.07, 0, 0.05, 5), forward_pid_gains=(1.6, 0, 0.03, 5), narrow_pid_gains=(0.03, 0, 0.03, 5), heading_pid_gains=(0.3, 0, 0.005, 5), exploration_mode="wall_following", physics_dt=1 / 60):
         self.battery_sensor = BatterySensor() #battery is initialing with 100%
         self.optical_flow_sensor = OpticalFlow()
-        self.forward_distance_sensor = DistanceSensor("forward")
-        self.backward_distance_sensor = DistanceSensor("backward")
-        self.leftward_distance_sensor = DistanceSensor("leftward")
-        self.rightward_distance_sensor = DistanceSensor("rightward")
+        # the four distance sensors are views of one sensor array, which measures all of them at once
+        self.distance_sensors = DistanceSensorArray(["forward", "backward", "leftward", "rightward"])
+        self.forward_distance_sensor = DistanceSensor("forward", sensor_array=self.distance_sensors)
+        self.backward_distance_sensor = DistanceSensor("backward", sensor_array=self.distance_sensors)
+        self.leftward_distance_sensor = DistanceSensor("leftward", sensor_array=self.distance_sensors)
+        self.rightward_distance_sensor = DistanceSensor("rightward", sensor_array=self.distance_sensors)
         self.orientation_sensor = IMU() #the drone's angle, the drone is looking rightward, beginning at 0
-        self.pid_controller = PIDController(0.07, 0, 0.05, 5)  
-        self.forward_pid_controller = PIDController(1.6,0, 0.03, 5)
-        self.narrow_pid_controller = PIDController(0.03,0, 0.03, 5)
+        # PID gains are (P, I, D, max I), the controllers are views of one bank of controllers
+        self.pid_bank = PIDBank(4)
+        self.pid_controller = PIDController(*wall_pid_gains, bank=self.pid_bank, index=0)
+        self.forward_pid_controller = PIDController(*forward_pid_gains, bank=self.pid_bank, index=1)
+        self.narrow_pid_controller = PIDController(*narrow_pid_gains, bank=self.pid_bank, index=2)
+        self.heading_pid_controller = PIDController(*heading_pid_gains, bank=self.pid_bank, index=3) # turns the drone to the frontier's way
         self.desired_wall_distance = 25 # Desired distance from the wall in cm
         self.desired_distance_switching_wall_delta = 3 # an eplsion to diff bettween turnning on the PID to finding a wall in wall switching mode 
         # Variables for wall following
         self.is_hugging_right = True  # Start by hugging the right wall
         self.starting_position = None # starting postion of the drone
-        self.trail = []
+        self.trail = Trail(indexed=True) # indexed for is_in_trail_environment
         self.returning_to_start = False
+        self.return_planner = None # plans the way home on the map the drone's sensors measure
+        self.return_path = None # the positions of the ticks of the way home, planned when the drone starts returning
+        self.return_path_index = 0 # the next position of return_path
+        self.return_position = None # where the drone is when it follows return_path
         self.use_pid = True
         self.cooldown = False
         self.cooldown_start_time_wall_switching = 0 
         self.drone_idle = False # flag to check if the drone stop because it was about to it a wall
+        self.clock = clock # returns the current time in seconds, a simulation can pass its own simulated clock
+        # "wall_following" hugs the walls, "frontier" flies to the closest places its sensors did not see yet
+        self.exploration_mode = exploration_mode
+        self.exploration_map = None # what the distance sensors measured, kept in frontier mode
+        self.frontier_planner = None
+        self.frontier_path = None # the way to the frontier the drone explores
+        self.frontier_path_index = 0 # the point of frontier_path the drone flies to
+        self.frontier_plan_age = 0 # sensors updates since frontier_path was planned
+        self.frontier_replan_interval = 10 # sensors updates between two plans, a nearer frontier may have shown up
+        self.frontier_search_turn = 0 # how much the drone turned around looking for a frontier
+        self.drone_radius = None # in pixels, known from the first sensors update
+        # the speeds (pixels per tick), the acceleration and the turns are per tick of 60 Hz, a tick of another length
+        # scales them, so the drone flies the same in simulated seconds at any physics rate
+        self.tick_scale = physics_dt * 60
+
+    # replaces the gains (P, I, D, max I) of the given controllers mid-flight, their integrals and last errors are kept
+    def set_pid_gains(self, wall_pid_gains=None, forward_pid_gains=None, narrow_pid_gains=None, heading_pid_gains=None):
+        for controller, gains in ((self.pid_controller, wall_pid_gains), (self.forward_pid_controller, forward_pid_gains),
+                                  (self.narrow_pid_controller, narrow_pid_gains), (self.heading_pid_controller, heading_pid_gains)):
+            if gains is not None:
+                controller.P, controller.I, controller.D, controller.max_i = gains
 
     def update_sensors(self, map_matrix, position, drone_radius, orientation):
-        self.forward_distance_sensor.update_values(map_matrix, position, drone_radius, orientation)
-        self.backward_distance_sensor.update_values(map_matrix, position, drone_radius,orientation)
-        self.leftward_distance_sensor.update_values(map_matrix, position, drone_radius,orientation)
-        self.rightward_distance_sensor.update_values(map_matrix, position, drone_radius,orientation)
+        self.distance_sensors.measure(map_matrix, [position], [orientation], drone_radius)
         self.battery_sensor.update_battrey_precentage()
+        if self.return_planner is None or self.return_planner.map_matrix is not map_matrix:
+            self.return_planner = ReturnPlanner(map_matrix, drone_radius, self.optical_flow_sensor.max_speed * self.tick_scale)
+        # the belief map costs a scan update every sensors update, only frontier mode reads it
+        if self.exploration_mode == "frontier":
+            self.update_exploration_map(map_matrix, position, drone_radius, orientation)
+
+    # adds the new measurement to the drone's own map and plans the way to the best frontier when needed
+    def update_exploration_map(self, map_matrix, position, drone_radius, orientation):
+        if self.exploration_map is None or (self.exploration_map.width, self.exploration_map.height) != (map_matrix.width, map_matrix.height):
+            self.exploration_map = ExplorationMap(map_matrix.width, map_matrix.height, sparse=map_matrix.is_tiled)
+            self.frontier_planner = FrontierPlanner(self.exploration_map)
+        self.drone_radius = drone_radius
+        self.exploration_map.add_scan(self.distance_sensors, position, orientation, drone_radius)
+        self.frontier_plan_age += 1
+        if self.should_replan():
+            self.frontier_path = self.frontier_planner.plan(position, orientation)
+            self.frontier_path_index = 0
+            self.frontier_plan_age = 0
+
+    # there is no way, it is old, its frontier was explored or an obstacle was found on it
+    def should_replan(self):
+        path = self.frontier_path
+        if not path or self.frontier_plan_age >= self.frontier_replan_interval:
+            return True
+        exploration_map = self.exploration_map
+        if not exploration_map.is_frontier(exploration_map.cell_of(path[-1])):
+            return True
+        return any(exploration_map.blocked_cells[exploration_map.cell_of(point)] for point in path[self.frontier_path_index:])
         
-    def move_drone(self,drone_pos , direction):
+    # the position after moving for ticks ticks of 60 Hz, by default for one tick of the simulation
+    def move_drone(self,drone_pos , direction, ticks=None):
         directions = {
             "forward": 0,
             "backward": 180,
@@ -45,8 +107,9 @@ class Drone:
             "rightward": 90
         }
           
-        dx = math.cos(math.radians(self.orientation_sensor.drone_orientation + directions[direction])) * self.optical_flow_sensor.current_speed  # moves in the x axis in a speed relatively to the drone's angle 
-        dy = math.sin(math.radians(self.orientation_sensor.drone_orientation + directions[direction])) * self.optical_flow_sensor.current_speed  # moves in the y axis in a speed relatively to the drone's angle
+        speed = self.optical_flow_sensor.current_speed * (self.tick_scale if ticks is None else ticks)
+        dx = math.cos(math.radians(self.orientation_sensor.drone_orientation + directions[direction])) * speed  # moves in the x axis in a speed relatively to the drone's angle 
+        dy = math.sin(math.radians(self.orientation_sensor.drone_orientation + directions[direction])) * speed  # moves in the y axis in a speed relatively to the drone's angle
         new_pos = [drone_pos[0] + dx, drone_pos[1] + dy]
 
         return new_pos
@@ -128,8 +191,8 @@ class Drone:
         max_correction = 10  # Define a maximum correction angle
         overall_correction = max(-max_correction, min(overall_correction, max_correction))
 
-        # Adjust the drone's angle based on the correction
-        self.update_drone_angle(overall_correction)
+        # Adjust the drone's angle based on the correction, the correction is per tick of 60 Hz
+        self.update_drone_angle(overall_correction * self.tick_scale)
 
         # Move the drone forward
         new_pos = self.move_drone(drone_pos, "forward")
@@ -144,8 +207,17 @@ class Drone:
         
         #checking if in returing home mode is activated
         if self.returning_to_start:
-            # Get the next position on the return trail
-            new_pos = self.get_next_position_for_trailback()
+            # Get the next position on the way home
+            new_pos = self.get_next_position_for_trailback(drone_pos)
+        # in frontier mode, the walls are followed only when there is no frontier to fly to
+        elif self.exploration_mode == "frontier" and self.frontier_path:
+            self.frontier_search_turn = 0
+            new_pos = self.frontier_following(drone_pos, dt)
+        elif self.exploration_mode == "frontier" and self.frontier_search_turn < 360:
+            # turn around in place, the beams may find a new frontier
+            self.optical_flow_sensor.reset_sensor()
+            self.update_drone_angle(10 * self.tick_scale)
+            self.frontier_search_turn += 10 * self.tick_scale
         else:
             # checking if the drone can fly
             if not self.drone_idle and not self.drone_about_to_touch_wall():
@@ -155,7 +227,7 @@ class Drone:
                 new_pos = self.wall_following(drone_pos,dt)
                 
                 #update cooldown mode  - False = there is no cooldown , cooldown is over
-                if time.time() - self.cooldown_start_time_wall_switching >= 2:
+                if self.clock() - self.cooldown_start_time_wall_switching >= 2:
                     self.cooldown = False
 
                 #if cooldown is over you can switch wall    
@@ -163,7 +235,7 @@ class Drone:
                     if self.is_in_trail_environment(new_pos):
                         self.switch_wall()
                         self.cooldown = True
-                        self.cooldown_start_time_wall_switching = time.time()
+                        self.cooldown_start_time_wall_switching = self.clock()
 
             else:
                 # checking if the drone is idle and if so it need to correct is angle to avoid touching the wall
@@ -181,30 +253,98 @@ class Drone:
 
         return new_pos
 
+    '''
+    flies along the way to the frontier: the heading PID turns the drone to a point a few cells ahead on the way and
+    the narrow path PID keeps it away from the walls on its sides. the drone turns in place while it faces away from
+    the way, flies slowly close to the walls and slides sideways, to the more open side, when the way forward is blocked.
+    '''
+    def frontier_following(self, drone_pos, dt, lookahead=3):
+        path = self.frontier_path
+        # skip the points of the way the drone already reached
+        while (self.frontier_path_index < len(path) - 1 and
+               math.hypot(path[self.frontier_path_index][0] - drone_pos[0], path[self.frontier_path_index][1] - drone_pos[1]) < self.exploration_map.cell_size):
+            self.frontier_path_index += 1
+        target = path[min(self.frontier_path_index + lookahead, len(path) - 1)]
+
+        angle_to_target = math.degrees(math.atan2(target[1] - drone_pos[1], target[0] - drone_pos[0]))
+        error = (angle_to_target - self.orientation_sensor.drone_orientation + 180) % 360 - 180
+        correction = self.heading_pid_controller.update(error, dt)
+        side_distance = min(self.leftward_distance_sensor.distance, self.rightward_distance_sensor.distance)
+        narrow_path_error = 0
+        if side_distance < self.desired_wall_distance:
+            narrow_path_error = self.rightward_distance_sensor.distance - self.leftward_distance_sensor.distance
+        correction += self.narrow_pid_controller.update(narrow_path_error, dt)
+        max_correction = 10  # the same limit as in wall following
+        self.update_drone_angle(max(-max_correction, min(correction, max_correction)) * self.tick_scale)
+
+        if abs(error) > 45:
+            # turn in place
+            self.optical_flow_sensor.reset_sensor()
+            return drone_pos
+        # full speed only in the open and facing the way
+        if abs(error) > 20 or self.forward_distance_sensor.distance < 60 or side_distance < 15:
+            self.optical_flow_sensor.current_speed = self.optical_flow_sensor.acceleration
+        else:
+            self.optical_flow_sensor.update_speed_acceleration(self.tick_scale)
+        side = "rightward" if self.rightward_distance_sensor.distance > self.leftward_distance_sensor.distance else "leftward"
+        for direction in ("forward", side):
+            new_pos = self.move_drone(drone_pos, direction)
+            # the move is checked at least a tick of 60 Hz ahead, a shorter tick would count the same obstacles around it
+            if not self.is_move_blocked(drone_pos, self.move_drone(drone_pos, direction, ticks=max(self.tick_scale, 1)), direction):
+                return new_pos
+            self.optical_flow_sensor.current_speed = self.optical_flow_sensor.acceleration
+        self.optical_flow_sensor.reset_sensor()
+        return drone_pos
+
+    def is_move_blocked(self, drone_pos, new_pos, direction):
+        # too close to the wall the sensor of that direction measured
+        sensor = {"forward": self.forward_distance_sensor, "leftward": self.leftward_distance_sensor, "rightward": self.rightward_distance_sensor}[direction]
+        if sensor.distance < (15 if direction == "forward" else 10):
+            return True
+        # never closer to the obstacles the drone measured around it
+        radius = self.drone_radius + 1
+        obstacles = self.exploration_map.count_obstacles(new_pos[0], new_pos[1], radius)
+        return obstacles > 0 and obstacles >= self.exploration_map.count_obstacles(drone_pos[0], drone_pos[1], radius)
+
     def drone_about_to_touch_wall(self):
         return (self.forward_distance_sensor.distance < 20) or (self.rightward_distance_sensor.distance < 6) or (self.leftward_distance_sensor.distance < 6)
     
     def set_starting_position(self, position):
         self.starting_position = position
-        self.trail = [position]  # Initialize the trail with the starting position
+        self.trail.clear()
+        self.trail.append(position)  # Initialize the trail with the starting position
+        self.return_path = None
+        # a new flight explores from scratch
+        if self.exploration_map is not None:
+            self.exploration_map.clear()
+        self.frontier_path = None
+        self.frontier_search_turn = 0
 
+    # the trail is the way the drone flew out, the way home is planned on it
     def update_position(self, position):
         if not self.returning_to_start:
             self.trail.append(position)
-        elif self.trail: #
-            self.trail.pop()  # Remove the last position as the drone moves back
 
-    def get_next_position_for_trailback(self):
-        if len(self.trail) > 1:
-            next_position = self.trail[-2 * self.optical_flow_sensor.max_speed if -2 * self.optical_flow_sensor.max_speed >= -len(self.trail) else 0]  # Get the second to last position
-            self.update_angle_to_next_position_for_trailback(next_position)
+    # the drone is home once it flew the whole way home planned back to the starting position
+    def is_back_home(self):
+        return self.returning_to_start and self.return_path is not None and self.return_path_index >= len(self.return_path)
+
+    def get_next_position_for_trailback(self, drone_pos):
+        # plan the way home once, and again only if the drone is not where the planned way left it
+        if self.return_path is None or list(drone_pos) != self.return_position:
+            self.return_path = self.return_planner.plan(drone_pos, *self.trail.to_numpy())
+            self.return_path_index = 0
+        if self.return_path_index < len(self.return_path):
+            next_position = self.return_path[self.return_path_index]
+            self.return_path_index += 1
+            self.return_position = next_position
+            self.update_angle_to_next_position_for_trailback(drone_pos, next_position)
             return next_position
         else:
             return self.starting_position
 
-    def update_angle_to_next_position_for_trailback(self, next_position):
+    def update_angle_to_next_position_for_trailback(self, current_position, next_position):
         # Calculate the angle needed to face the next position
-        current_position = self.trail[-1]
         dx = next_position[0] - current_position[0]
         dy = next_position[1] - current_position[1]
         angle_to_next_position = math.degrees(math.atan2(dy, dx))
@@ -212,12 +352,9 @@ class Drone:
         # Update the drone's angle to face the next position
         self.orientation_sensor.update_orientation(angle_to_next_position)
         
+    # radius is in ticks of 60 Hz like the speed, the trail's points are closer to each other at a higher rate
     def is_in_trail_environment(self, point, radius = 0.5):
-        for trail_point in self.trail:
-            distance = math.sqrt((point[0] - trail_point[0]) ** 2 + (point[1] - trail_point[1]) ** 2)
-            if distance <= radius:
-                return True
-        return False
+        return self.trail.has_point_within(point, radius * self.tick_scale)
     
     def correct_angle_to_avoid_wall(self):
         # Determine the direction of the wall
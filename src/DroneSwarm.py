@@ -0,0 +1,228 @@
+import math
+import time
+import numpy as np
+from DistanceSensorArray import DistanceSensorArray
+from PIDBank import PIDBank
+from ReturnPlanner import ReturnPlanner
+from SwarmTrail import SwarmTrail
+
+# math.atan2 over arrays - numpy's arctan2 can round differently than the C library's, which Drone uses
+atan2 = np.frompyfunc(math.atan2, 2, 1)
+
+'''
+DroneSwarm class - the state of many drones as NumPy arrays, one entry per drone, stepped all together.
+every method takes the indexes of the drones it works on and does the same steps as the matching method of Drone,
+so each drone of the swarm flies exactly like a Drone with the same sensor readings would.
+'''
+class DroneSwarm:
+    # the columns of ranges
+    FORWARD, BACKWARD, LEFTWARD, RIGHTWARD = range(4)
+
+    def __init__(self, drones_count, map_width, map_height, clock=time.time, wall_pid_gains=(0.07, 0, 0.05, 5), forward_pid_gains=(1.6, 0, 0.03, 5), narrow_pid_gains=(0.03, 0, 0.03, 5), physics_dt=1 / 60):
+        self.drones_count = drones_count
+        self.distance_sensors = DistanceSensorArray(["forward", "backward", "leftward", "rightward"], drones_count)
+        self.ranges = np.zeros((drones_count, 4))  # the distances from an obstacle in cm, ranges[drone][direction]
+        self.positions = np.zeros((drones_count, 2))
+        self.starting_positions = np.zeros((drones_count, 2))
+        self.orientations = np.zeros(drones_count)  # the drones' angles, like IMU
+        # speeds, like OpticalFlow
+        self.acceleration = 1
+        self.max_speed = 3
+        self.speeds = np.zeros(drones_count, dtype=np.int64)
+        # battery, like BatterySensor: updated 10 times per second for 480 seconds
+        self.amount_of_decisecond_drone_can_fly = 4800
+        self.battery_ticks = np.full(drones_count, self.amount_of_decisecond_drone_can_fly, dtype=np.int64)
+        self.battery_percentages = np.full(drones_count, 100.0)
+        # PID controllers, controller d of each bank is drone d's: gains are (P, I, D, max I)
+        self.pid_controller = PIDBank(drones_count, *wall_pid_gains)
+        self.forward_pid_controller = PIDBank(drones_count, *forward_pid_gains)
+        self.narrow_pid_controller = PIDBank(drones_count, *narrow_pid_gains)
+        self.desired_wall_distance = 25 # Desired distance from the wall in cm
+        self.desired_distance_switching_wall_delta = 3
+        # Variables for wall following
+        self.is_hugging_right = np.ones(drones_count, dtype=bool)
+        self.trail = SwarmTrail(drones_count, map_width, map_height)
+        self.returning_to_start = np.zeros(drones_count, dtype=bool)
+        self.return_planner = None # plans the way home on the map the drones' sensors measure
+        # the ways home of all the drones one after the other, drone d's is return_paths[starts[d]:starts[d] + lengths[d]]
+        self.return_paths = np.empty((1024, 2))
+        self.return_paths_used = 0
+        self.return_path_starts = np.zeros(drones_count, dtype=np.int64)
+        self.return_path_lengths = np.full(drones_count, -1, dtype=np.int64)  # -1 until a way home is planned
+        self.return_path_indexes = np.zeros(drones_count, dtype=np.int64)  # the next position of each way home
+        self.return_positions = np.zeros((drones_count, 2))  # where the drones are when they follow their ways home
+        self.use_pid = np.ones(drones_count, dtype=bool)
+        self.cooldown = np.zeros(drones_count, dtype=bool)
+        self.cooldown_start_times_wall_switching = np.zeros(drones_count)
+        self.drone_idle = np.zeros(drones_count, dtype=bool)
+        self.clock = clock # returns the current time in seconds, shared by all the drones
+        self.tick_scale = physics_dt * 60  # like Drone's, the speeds and the turns are per tick of 60 Hz
+
+    def update_sensors(self, map_matrix, drone_radius, drones):
+        self.ranges[drones] = self.distance_sensors.measure(map_matrix, self.positions[drones], self.orientations[drones], drone_radius)
+        drones = drones[self.battery_percentages[drones] != 0]
+        self.battery_ticks[drones] -= 1
+        self.battery_percentages[drones] = (self.battery_ticks[drones] / self.amount_of_decisecond_drone_can_fly) * 100
+        if self.return_planner is None or self.return_planner.map_matrix is not map_matrix:
+            self.return_planner = ReturnPlanner(map_matrix, drone_radius, self.max_speed * self.tick_scale)
+
+    def accelerate(self, drones):
+        drones = drones[self.speeds[drones] < self.max_speed]
+        self.speeds[drones] += self.acceleration
+
+    def decelerate(self, drones):
+        drones = drones[self.speeds[drones] > 0]
+        self.speeds[drones] -= self.acceleration
+
+    # the drones' positions after moving forward one tick
+    def move_drones(self, drones):
+        angles = np.radians(self.orientations[drones])
+        speeds = self.speeds[drones] * self.tick_scale
+        dx = np.cos(angles) * speeds
+        dy = np.sin(angles) * speeds
+        return self.positions[drones] + np.column_stack((dx, dy))
+
+    def update_drone_angles(self, drones, angle_deltas):
+        self.orientations[drones] = np.mod(self.orientations[drones] + angle_deltas, 360)
+
+    def switch_wall(self, drones):
+        self.use_pid[drones] = False
+        # Adjust drone to look 10 degrees away from the current wall
+        self.update_drone_angles(drones, np.where(self.is_hugging_right[drones], -10, 10))
+
+    def wall_following(self, drones, dt):
+        delta = self.desired_wall_distance - self.desired_distance_switching_wall_delta
+        forward = self.ranges[drones, self.FORWARD]
+        leftward = self.ranges[drones, self.LEFTWARD]
+        rightward = self.ranges[drones, self.RIGHTWARD]
+        hugging_right = self.is_hugging_right[drones]
+
+        # the drones which dont use PID move forward without it until they get close to a wall
+        searching = ~self.use_pid[drones]
+        far_from_walls = (forward > delta) & (leftward > delta) & (rightward > delta)
+        # if found the wall on the other side, hug it
+        found_wall = searching & ~far_from_walls & ((forward <= delta) | np.where(hugging_right, leftward <= delta, rightward <= delta))
+        hugging_right = hugging_right ^ found_wall
+        self.is_hugging_right[drones] = hugging_right
+        # Re-enable PID because we are close to a wall
+        self.use_pid[drones[searching & ~far_from_walls]] = True
+
+        with_pid = ~(searching & far_from_walls)
+        pid_drones = drones[with_pid]
+        forward, leftward, rightward, hugging_right = forward[with_pid], leftward[with_pid], rightward[with_pid], hugging_right[with_pid]
+        # Calculate the error from the desired wall distance
+        error = np.where(hugging_right, rightward - self.desired_wall_distance, -1 * (leftward - self.desired_wall_distance))
+        turnning_direction = np.where(hugging_right, -1, 1)
+        overall_correction = self.pid_controller.update(error, dt, pid_drones)
+
+        # Calculate the correction for case the drone's front is getting too close to a wall
+        front_danger_distance = 40
+        forward_distance_error = np.where(forward >= front_danger_distance, 0, front_danger_distance - forward)
+        forward_correction = self.forward_pid_controller.update(forward_distance_error, dt, pid_drones)
+
+        narrow_path = (hugging_right & (leftward < rightward)) | (~hugging_right & (leftward > rightward))
+        narrow_path_error = np.where(narrow_path, rightward - leftward, 0)
+        narrow_correction = self.narrow_pid_controller.update(narrow_path_error, dt, pid_drones)
+
+        #Sum up the corrections for the wall hugging and the drone's front error correction
+        overall_correction = overall_correction + ((forward_correction * turnning_direction) + narrow_correction)
+        # Limit the correction to prevent aggressive maneuvers
+        max_correction = 10
+        overall_correction = np.clip(overall_correction, -max_correction, max_correction)
+        self.update_drone_angles(pid_drones, overall_correction * self.tick_scale)
+
+        # Move the drones forward
+        return self.move_drones(drones)
+
+    # the drones' next positions, like Drone.update_position_by_algorithm
+    def update_positions_by_algorithm(self, drones, dt):
+        new_positions = self.positions[drones].copy()
+        # Check battery level and initiate return if necessary
+        self.returning_to_start[drones[self.battery_percentages[drones] <= 50]] = True
+
+        returning = self.returning_to_start[drones]
+        if returning.any():
+            new_positions[returning] = self.get_next_positions_for_trailback(drones[returning])
+
+        flying = np.flatnonzero(~returning)  # places in drones
+        about_to_touch_wall = self.drones_about_to_touch_wall(drones[flying])
+        idle = self.drone_idle[drones[flying]]
+        free = ~idle & ~about_to_touch_wall  # the drones which can fly
+        self.accelerate(drones[flying[free & (self.speeds[drones[flying]] == 0)]])
+
+        # the idle drones only adjust their angle to avoid touching the wall
+        following = flying[free | idle]
+        new_positions[following] = self.wall_following(drones[following], dt)
+
+        # update cooldown mode - False = there is no cooldown, cooldown is over
+        now = self.clock()
+        free_drones = drones[flying[free]]
+        self.cooldown[free_drones[now - self.cooldown_start_times_wall_switching[free_drones] >= 2]] = False
+        # if cooldown is over the drone can switch wall
+        checking = flying[free][~self.cooldown[free_drones]]
+        in_trail = self.is_in_trail_environment(drones[checking], new_positions[checking])
+        switching = drones[checking[in_trail]]
+        self.switch_wall(switching)
+        self.cooldown[switching] = True
+        self.cooldown_start_times_wall_switching[switching] = now
+
+        # the idle drones which are no longer about to touch the wall fly again
+        self.drone_idle[drones[flying[idle & ~about_to_touch_wall]]] = False
+        # the flying drones which are about to touch the wall stop and will adjust
+        stopping = drones[flying[~idle & about_to_touch_wall]]
+        self.drone_idle[stopping] = True
+        self.decelerate(stopping)
+        return new_positions
+
+    def drones_about_to_touch_wall(self, drones):
+        return ((self.ranges[drones, self.FORWARD] < 20) | (self.ranges[drones, self.RIGHTWARD] < 6) |
+                (self.ranges[drones, self.LEFTWARD] < 6))
+
+    def set_starting_positions(self, drones):
+        self.starting_positions[drones] = self.positions[drones]
+        self.trail.clear(drones)
+        self.trail.append(drones, self.positions[drones, 0], self.positions[drones, 1])
+        self.return_path_lengths[drones] = -1
+
+    # records the drones' new positions in their trails, like Drone.update_position
+    def update_positions(self, drones):
+        appending = drones[~self.returning_to_start[drones]]
+        self.trail.append(appending, self.positions[appending, 0], self.positions[appending, 1])
+
+    # the drones which flew their whole way home back to the starting position
+    def is_back_home(self):
+        return self.returning_to_start & (self.return_path_lengths >= 0) & (self.return_path_indexes >= self.return_path_lengths)
+
+    def plan_return_path(self, drone):
+        length = self.trail.lengths[drone]
+        path = self.return_planner.plan(self.positions[drone], self.trail.xs[drone, :length], self.trail.ys[drone, :length])
+        # double the storage when it is full, the ways home are only added
+        while self.return_paths_used + len(path) > len(self.return_paths):
+            self.return_paths = np.concatenate((self.return_paths, np.empty(self.return_paths.shape)))
+        if path:
+            self.return_paths[self.return_paths_used:self.return_paths_used + len(path)] = path
+        self.return_path_starts[drone] = self.return_paths_used
+        self.return_path_lengths[drone] = len(path)
+        self.return_path_indexes[drone] = 0
+        self.return_paths_used += len(path)
+
+    def get_next_positions_for_trailback(self, drones):
+        # plan the ways home once, and again only for drones which are not where their planned ways left them
+        planned = (self.return_path_lengths[drones] >= 0) & (self.positions[drones] == self.return_positions[drones]).all(axis=1)
+        for drone in drones[~planned].tolist():
+            self.plan_return_path(drone)
+
+        next_positions = self.starting_positions[drones]
+        on_way = self.return_path_indexes[drones] < self.return_path_lengths[drones]
+        drones = drones[on_way]
+        next_positions[on_way] = self.return_paths[self.return_path_starts[drones] + self.return_path_indexes[drones]]
+        self.return_path_indexes[drones] += 1
+        self.return_positions[drones] = next_positions[on_way]
+        # Update the drones' angles to face the next positions
+        dx = next_positions[on_way, 0] - self.positions[drones, 0]
+        dy = next_positions[on_way, 1] - self.positions[drones, 1]
+        self.orientations[drones] = np.degrees(atan2(dy, dx).astype(float))
+        return next_positions
+
+    def is_in_trail_environment(self, drones, points, radius=0.5):
+        return self.trail.has_point_within(drones, points[:, 0], points[:, 1], radius * self.tick_scale)
@@ -0,0 +1,216 @@
+import numpy as np
+from TiledArray import SparseTiledArray
+
+'''
+ExplorationMap class - the drone's own belief of the map, built from what its distance sensors measured.
+every pixel holds the log-odds of being an obstacle, in whole steps: every beam which passes through a pixel adds
+free_update to it, every beam which ends on it adds occupied_update, and a pixel no beam reached yet is UNKNOWN.
+the pixels are grouped in square cells of cell_size pixels, which the frontier planner works on: a cell is blocked if
+one of its pixels is believed to be an obstacle, and free if one of its pixels is believed to be free and it is not
+blocked. the cells are grouped again in square tiles of tile_size pixels, each one counting its unknown pixels, so
+queries like "how much was not seen yet around me" look at a few tiles instead of at every pixel.
+a scan only updates the cells and the tiles its beams touched.
+a sparse map (for a map at native resolution) allocates the log-odds of a tile only once a beam touched it.
+'''
+class ExplorationMap:
+    UNKNOWN = -128
+
+    def __init__(self, width, height, cell_size=8, tile_size=32, obstacle_radius=2, free_update=-1, occupied_update=4,
+                 occupied_threshold=2, max_log_odds=16, sparse=False):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.tile_size = tile_size  # a multiple of cell_size
+        # a beam touches one pixel of a wall, the pixels around it are marked as well so the drone keeps away from it
+        self.obstacle_radius = obstacle_radius
+        self.free_update = free_update
+        self.occupied_update = occupied_update
+        self.occupied_threshold = occupied_threshold  # a pixel is an obstacle from this log-odds up, and free below 0
+        self.max_log_odds = max_log_odds  # log-odds are kept in [-max_log_odds, max_log_odds], a belief can still change
+        self.tiles_width = (width + tile_size - 1) // tile_size
+        self.tiles_height = (height + tile_size - 1) // tile_size
+        self.cells_width = self.tiles_width * tile_size // cell_size
+        self.cells_height = self.tiles_height * tile_size // cell_size
+        # padded to whole tiles, the padding is outside the map, which is as good as an obstacle for the drone
+        if sparse:
+            self.log_odds = SparseTiledArray(self.tiles_width * tile_size, self.tiles_height * tile_size, tile_size, np.int8, self.new_tile)
+        else:
+            self.log_odds = np.empty((self.tiles_height * tile_size, self.tiles_width * tile_size), dtype=np.int8)
+        self.free_cells = np.zeros((self.cells_height, self.cells_width), dtype=bool)
+        self.blocked_cells = np.zeros((self.cells_height, self.cells_width), dtype=bool)
+        self.known_cells = np.zeros((self.cells_height, self.cells_width), dtype=bool)
+        self.unknown_counts = np.zeros((self.tiles_height, self.tiles_width), dtype=np.int32)
+        # the cells where a beam reached its max range without hitting anything, there is more to see beyond them
+        self.frontier_candidates = set()
+        self.clear()
+
+    # the log-odds of a tile no beam touched yet: unknown, and its padding outside the map an obstacle
+    def new_tile(self, tile_row, tile_column):
+        tile = np.full((self.tile_size, self.tile_size), self.UNKNOWN, dtype=np.int8)
+        tile[max(self.height - tile_row * self.tile_size, 0):, :] = self.max_log_odds
+        tile[:, max(self.width - tile_column * self.tile_size, 0):] = self.max_log_odds
+        return tile
+
+    def clear(self):
+        if isinstance(self.log_odds, SparseTiledArray):
+            self.log_odds.clear()
+        else:
+            self.log_odds[:] = self.UNKNOWN
+            self.log_odds[self.height:, :] = self.max_log_odds
+            self.log_odds[:, self.width:] = self.max_log_odds
+        # the cells with padding are known and blocked, the tiles' unknown pixels are their pixels inside the map
+        rows = np.arange(self.cells_height)[:, None]
+        columns = np.arange(self.cells_width)[None, :]
+        edge_cells = ((rows + 1) * self.cell_size > self.height) | ((columns + 1) * self.cell_size > self.width)
+        self.free_cells[:] = False
+        self.blocked_cells[:] = edge_cells
+        self.known_cells[:] = edge_cells
+        tile_heights = np.clip(self.height - np.arange(self.tiles_height) * self.tile_size, 0, self.tile_size)
+        tile_widths = np.clip(self.width - np.arange(self.tiles_width) * self.tile_size, 0, self.tile_size)
+        self.unknown_counts[:] = tile_heights[:, None] * tile_widths[None, :]
+        self.frontier_candidates.clear()
+
+    # the blocks of size x size pixels at the given block rows and columns, as an (n, size, size) array
+    def get_blocks(self, rows, columns, size):
+        if isinstance(self.log_odds, SparseTiledArray):
+            return self.log_odds.get_blocks(rows, columns, size)
+        blocks = self.log_odds.reshape(self.log_odds.shape[0] // size, size, self.log_odds.shape[1] // size, size)
+        return blocks[rows, :, columns, :]
+
+    def update_cells(self, rows, columns):
+        blocks = self.get_blocks(rows, columns, self.cell_size)
+        known = blocks != self.UNKNOWN
+        blocked = (blocks >= self.occupied_threshold).any(axis=(1, 2))
+        self.known_cells[rows, columns] = known.any(axis=(1, 2))
+        self.blocked_cells[rows, columns] = blocked
+        self.free_cells[rows, columns] = (known & (blocks < 0)).any(axis=(1, 2)) & ~blocked
+
+    def update_tiles(self, rows, columns):
+        blocks = self.get_blocks(rows, columns, self.tile_size)
+        self.unknown_counts[rows, columns] = (blocks == self.UNKNOWN).sum(axis=(1, 2))
+
+    '''
+    the pixels of the straight lines from (start_xs[i], start_ys[i]) to (end_xs[i], end_ys[i]), all the lines at
+    once. every line steps one pixel at a time along its longer axis and rounds the other axis, like Bresenham's
+    line algorithm, so it has no gaps. returns the x's, y's and line of every pixel, and which pixels end a line.
+    '''
+    def trace_lines(self, start_xs, start_ys, end_xs, end_ys):
+        dxs, dys = end_xs - start_xs, end_ys - start_ys
+        lengths = np.maximum(np.maximum(np.abs(dxs), np.abs(dys)), 1)
+        steps = np.arange(lengths.max() + 1)
+        on_line = steps[None, :] <= lengths[:, None]
+        # integer rounding of start + step * delta / length, the same on every machine
+        xs = start_xs[:, None] + (2 * steps[None, :] * dxs[:, None] + lengths[:, None]) // (2 * lengths[:, None])
+        ys = start_ys[:, None] + (2 * steps[None, :] * dys[:, None] + lengths[:, None]) // (2 * lengths[:, None])
+        lines = np.broadcast_to(np.arange(len(lengths))[:, None], on_line.shape)
+        is_end = steps[None, :] == lengths[:, None]
+        return xs[on_line], ys[on_line], lines[on_line], is_end[on_line]
+
+    # the flat indexes of the pixels inside the map, each one once
+    def get_pixel_indexes(self, xs, ys):
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        indexes = np.sort(ys[inside] * self.log_odds.shape[1] + xs[inside])
+        first = np.ones(len(indexes), dtype=bool)
+        first[1:] = indexes[1:] != indexes[:-1]
+        return indexes[first]
+
+    # adds update to the log-odds of the pixels, an unknown pixel starts from 0
+    def update_pixels(self, indexes, update):
+        ys, xs = np.divmod(indexes, self.log_odds.shape[1])
+        values = self.log_odds[ys, xs].astype(np.int16)
+        values[values == self.UNKNOWN] = 0
+        self.log_odds[ys, xs] = np.clip(values + update, -self.max_log_odds, self.max_log_odds)
+
+    '''
+    adds the beams of one measurement of a DistanceSensorArray, taken at position with the given orientation.
+    every beam starts where the sensor's ray starts and ends on the step of its range: the pixels before the end are
+    free, the end is the obstacle the beam hit, unless the beam reached the sensor's max range.
+    '''
+    def add_scan(self, sensor_array, position, orientation, drone_radius, drone_index=0):
+        angles = np.radians(orientation + sensor_array.beam_angles)
+        dx = np.cos(angles)
+        dy = np.sin(angles)
+        sensor_x = np.where(dx < 0, position[0] - drone_radius, position[0] + drone_radius)
+        sensor_y = np.where(dy < 0, position[1] - drone_radius, position[1] + drone_radius)
+        steps = np.round(np.asarray(sensor_array.ranges[drone_index], dtype=float) / 2.5).astype(np.int64)
+        hit = steps < sensor_array.max_range
+        end_xs = (sensor_x + dx * steps).astype(np.int64)
+        end_ys = (sensor_y + dy * steps).astype(np.int64)
+
+        xs, ys, lines, is_end = self.trace_lines(sensor_x.astype(np.int64), sensor_y.astype(np.int64), end_xs, end_ys)
+        free_xs = np.append(xs[~is_end], int(position[0]))
+        free_ys = np.append(ys[~is_end], int(position[1]))
+        offset_ys, offset_xs = np.mgrid[-self.obstacle_radius:self.obstacle_radius + 1, -self.obstacle_radius:self.obstacle_radius + 1]
+        obstacle_xs = (end_xs[hit][:, None] + offset_xs.ravel()[None, :]).ravel()
+        obstacle_ys = (end_ys[hit][:, None] + offset_ys.ravel()[None, :]).ravel()
+        # an obstacle the beam hit counts after the beams which passed next to it
+        self.update_pixels(self.get_pixel_indexes(free_xs, free_ys), self.free_update)
+        self.update_pixels(self.get_pixel_indexes(obstacle_xs, obstacle_ys), self.occupied_update)
+
+        # only the cells and tiles of the pixels which changed are updated
+        touched = self.get_pixel_indexes(np.concatenate((free_xs, obstacle_xs)), np.concatenate((free_ys, obstacle_ys)))
+        touched_ys, touched_xs = np.divmod(touched, self.log_odds.shape[1])
+        for size, update in ((self.cell_size, self.update_cells), (self.tile_size, self.update_tiles)):
+            blocks = np.sort((touched_ys // size) * (self.log_odds.shape[1] // size) + touched_xs // size)
+            first = np.ones(len(blocks), dtype=bool)
+            first[1:] = blocks[1:] != blocks[:-1]
+            update(*np.divmod(blocks[first], self.log_odds.shape[1] // size))
+
+        # the last free pixel of a beam which hit nothing is where there is more to see
+        for beam in np.flatnonzero(~hit).tolist():
+            beam_xs, beam_ys = xs[(lines == beam) & ~is_end], ys[(lines == beam) & ~is_end]
+            if len(beam_xs) and 0 <= beam_xs[-1] < self.width and 0 <= beam_ys[-1] < self.height:
+                self.frontier_candidates.add((int(beam_ys[-1]) // self.cell_size, int(beam_xs[-1]) // self.cell_size))
+
+    # a cell is a frontier while one of the 8 cells around it was not seen yet
+    def is_frontier(self, cell):
+        row, column = cell
+        around = self.known_cells[max(row - 1, 0):row + 2, max(column - 1, 0):column + 2]
+        return bool(self.free_cells[row, column]) and not around.all()
+
+    # the frontier candidates which are still frontiers, the others are dropped for good
+    def get_frontiers(self):
+        self.frontier_candidates = {cell for cell in self.frontier_candidates if self.is_frontier(cell)}
+        return self.frontier_candidates
+
+    # the number of obstacle pixels the drone believes are in the box of pixels [x - radius, x + radius] x [y - radius, y + radius]
+    def count_obstacles(self, x, y, radius):
+        x, y = int(x), int(y)
+        top, bottom = max(y - radius, 0), min(y + radius + 1, self.log_odds.shape[0])
+        left, right = max(x - radius, 0), min(x + radius + 1, self.log_odds.shape[1])
+        if isinstance(self.log_odds, SparseTiledArray):
+            box = self.log_odds.read_window(left, top, right - left, bottom - top)
+        else:
+            box = self.log_odds[top:bottom, left:right]
+        return int(np.count_nonzero(box >= self.occupied_threshold))
+
+    # the rows and columns of the tiles which overlap the square of pixels [x - radius, x + radius] x [y - radius, y + radius]
+    def get_tiles_near(self, position, radius):
+        top = max(int(position[1] - radius) // self.tile_size, 0)
+        bottom = min(int(position[1] + radius) // self.tile_size + 1, self.tiles_height)
+        left = max(int(position[0] - radius) // self.tile_size, 0)
+        right = min(int(position[0] + radius) // self.tile_size + 1, self.tiles_width)
+        return slice(top, bottom), slice(left, right)
+
+    # the number of pixels no beam reached yet in the tiles within radius pixels of position
+    def count_unknown_near(self, position, radius):
+        return int(self.unknown_counts[self.get_tiles_near(position, radius)].sum())
+
+    '''
+    the centers of the tiles within radius pixels of position which are at least min_unknown_fraction unknown,
+    nearest first. the walls are unknown as well (no beam gets inside a wall), so a tile full of wall counts too.
+    '''
+    def get_unexplored_tiles_near(self, position, radius, min_unknown_fraction=0.5):
+        rows, columns = self.get_tiles_near(position, radius)
+        tile_rows, tile_columns = np.nonzero(self.unknown_counts[rows, columns] >= min_unknown_fraction * self.tile_size * self.tile_size)
+        centers_x = (tile_columns + columns.start + 0.5) * self.tile_size
+        centers_y = (tile_rows + rows.start + 0.5) * self.tile_size
+        order = np.argsort(np.hypot(centers_x - position[0], centers_y - position[1]), kind="stable")
+        return [[float(centers_x[i]), float(centers_y[i])] for i in order]
+
+    # the (row, column) of the cell of a position
+    def cell_of(self, position):
+        return int(position[1]) // self.cell_size, int(position[0]) // self.cell_size
+
+    def cell_center(self, cell):
+        return [(cell[1] + 0.5) * self.cell_size, (cell[0] + 0.5) * self.cell_size]
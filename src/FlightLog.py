@@ -0,0 +1,80 @@
+import argparse
+import struct
+import numpy as np
+from FlightRecorder import FlightRecorder
+
+# FlightLog class - random access replay of a FlightRecorder log, the records are memory-mapped and never loaded whole
+class FlightLog:
+    # the same layout as FlightRecorder.record_format
+    record_dtype = np.dtype([
+        ("tick", "<u4"), ("x", "<f8"), ("y", "<f8"), ("orientation", "<f8"),
+        ("forward", "<f4"), ("backward", "<f4"), ("leftward", "<f4"), ("rightward", "<f4"),
+        ("speed", "<f4"), ("battery", "<f4"),
+        ("wall_pid", "<f4"), ("forward_pid", "<f4"), ("narrow_pid", "<f4"),
+        ("flags", "u1"),
+    ])
+
+    def __init__(self, path):
+        header_size = struct.calcsize(FlightRecorder.header_format)
+        with open(path, "rb") as log_file:
+            header = log_file.read(header_size)
+        magic, version, record_size, self.physics_rate, self.sensors_rate, seed, map_name = struct.unpack(FlightRecorder.header_format, header)
+        if magic != FlightRecorder.magic:
+            raise ValueError(f"{path} is not a flight log")
+        if version != FlightRecorder.version or record_size != self.record_dtype.itemsize:
+            raise ValueError(f"{path} is a flight log of an unsupported version {version}")
+        self.seed = None if seed == -1 else seed
+        self.map_name = map_name.rstrip(b"\0").decode("utf-8")
+        self.records = np.memmap(path, dtype=self.record_dtype, mode="r", offset=header_size)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, i):
+        return self.records[i]
+
+    # the simulated time of every record, in seconds
+    def get_times(self):
+        return self.records["tick"] / self.physics_rate
+
+    def get_crash_ticks(self):
+        return self.records["tick"][(self.records["flags"] & FlightRecorder.CRASHED) != 0]
+
+    # the index of the first record where the two logs differ, or None if one log is a prefix of the other
+    def find_divergence(self, other):
+        length = min(len(self), len(other))
+        differ = self.records[:length] != other.records[:length]
+        indexes = np.flatnonzero(differ)
+        return int(indexes[0]) if indexes.size else None
+
+
+def format_record(record):
+    return (f"tick {record['tick']}: pos ({record['x']:.2f}, {record['y']:.2f}) angle {record['orientation']:.1f} "
+            f"F/B/L/R {record['forward']:.1f}/{record['backward']:.1f}/{record['leftward']:.1f}/{record['rightward']:.1f} cm "
+            f"speed {record['speed']:.1f} battery {record['battery']:.1f} % "
+            f"PID {record['wall_pid']:.3f}/{record['forward_pid']:.3f}/{record['narrow_pid']:.3f} flags {record['flags']:#04b}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect a recorded flight")
+    parser.add_argument("log_path", help="flight log written by FlightRecorder")
+    parser.add_argument("--at", type=int, nargs="+", default=[], help="print the records at these indexes")
+    parser.add_argument("--diff", default=None, help="another flight log to find the first differing record with")
+    args = parser.parse_args()
+
+    log = FlightLog(args.log_path)
+    print(f"Map: {log.map_name}, seed: {log.seed}, records: {len(log)}, simulated time: {len(log) / log.physics_rate:.1f} s")
+    print(f"Crashes at ticks: {log.get_crash_ticks().tolist()}")
+    for i in args.at:
+        print(format_record(log[i]))
+    if args.diff:
+        other = FlightLog(args.diff)
+        index = log.find_divergence(other)
+        if index is None:
+            print("The flights are identical")
+        else:
+            print(f"The flights diverge at record {index}:")
+            print(format_record(log[index]))
+            print(format_record(other[index]))
+
+if __name__ == "__main__":
+    main()
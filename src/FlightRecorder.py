@@ -0,0 +1,54 @@
+import struct
+
+# FlightRecorder class - streams the per-tick state of a flight into a compact, append-only binary log
+class FlightRecorder:
+    # header: magic, version, record size, physics rate, sensors rate, seed (-1 for none), map name
+    header_format = "<4sHHIIq44s"
+    # record: tick, x, y, orientation, forward/backward/leftward/rightward ranges (cm), speed, battery (%),
+    # wall/forward/narrow PID outputs, flags
+    record_format = "<Iddd9fB"
+    magic = b"DRFL"
+    version = 1
+
+    # flags bits
+    RETURNING = 1
+    IDLE = 2
+    HUGGING_RIGHT = 4
+    CRASHED = 8  # the drone crashed and respawned on this tick
+
+    def __init__(self, path, physics_rate, sensors_rate, seed=None, map_name=""):
+        self.record_struct = struct.Struct(self.record_format)
+        self.file = open(path, "wb")
+        self.file.write(struct.pack(self.header_format, self.magic, self.version, self.record_struct.size,
+                                    physics_rate, sensors_rate, -1 if seed is None else seed,
+                                    self.encode_map_name(map_name)))
+        self.crashes = 0
+
+    # the map name as at most 44 bytes of UTF-8, cut at a whole character
+    @staticmethod
+    def encode_map_name(map_name):
+        return map_name.encode("utf-8")[:44].decode("utf-8", errors="ignore").encode("utf-8")
+
+    # appends the state of the simulation after its last tick
+    def record(self, simulation):
+        drone = simulation.drone
+        flags = 0
+        if drone.returning_to_start:
+            flags |= self.RETURNING
+        if drone.drone_idle:
+            flags |= self.IDLE
+        if drone.is_hugging_right:
+            flags |= self.HUGGING_RIGHT
+        if simulation.crashes != self.crashes:
+            flags |= self.CRASHED
+            self.crashes = simulation.crashes
+        self.file.write(self.record_struct.pack(
+            simulation.ticks, simulation.drone_pos[0], simulation.drone_pos[1], drone.orientation_sensor.drone_orientation,
+            drone.forward_distance_sensor.distance, drone.backward_distance_sensor.distance,
+            drone.leftward_distance_sensor.distance, drone.rightward_distance_sensor.distance,
+            drone.optical_flow_sensor.get_current_speed(), drone.battery_sensor.get_battrey_precentage(),
+            drone.pid_controller.last_output, drone.forward_pid_controller.last_output,
+            drone.narrow_pid_controller.last_output, flags))
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,96 @@
+import argparse
+import csv
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from BatchRunner import DEFAULT_GAINS, format_gains, parse_gains
+from HeadlessSimulation import HeadlessSimulation
+
+'''
+flies variants of one flight from a snapshot in parallel, instead of flying the part before the snapshot again for
+every variant. a variant is a dict of "pid_gains" (like Drone.set_pid_gains's arguments) and "drone" (attributes of
+the drone to set, e.g. {"is_hugging_right": False} to follow the other wall from there).
+'''
+
+# the columns of the results file, one row per variant
+RESULTS_FIELDS = ["variant", "wall_pid_gains", "forward_pid_gains", "narrow_pid_gains", "coverage", "crashes",
+                  "sim_time", "returned_home", "time_to_return", "battery"]
+
+worker_snapshot = None  # the snapshot every variant of a worker process starts from, sent to the worker once
+
+def init_worker(snapshot):
+    global worker_snapshot
+    worker_snapshot = snapshot
+
+# one variant, runs in a worker process
+def run_variant(job):
+    variant, max_time = job
+    simulation = HeadlessSimulation.from_snapshot(worker_snapshot)
+    simulation.drone.set_pid_gains(**variant.get("pid_gains", {}))
+    for name, value in variant.get("drone", {}).items():
+        setattr(simulation.drone, name, value)
+    stats = simulation.run(max_time=max_time)
+    del stats["trail"]
+    return stats
+
+# the stats of every variant flown from the snapshot until max_time seconds of the whole flight, in order
+def fork(snapshot, variants, max_time=480, workers=None):
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(snapshot,)) as executor:
+        return list(executor.map(run_variant, [(variant, max_time) for variant in variants]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fly a flight until a point, then fly variants of the rest of it from there on all CPU cores")
+    parser.add_argument("map_path", nargs="?", default=None, help="path to the map image (not needed with --snapshot)")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the drone's spawn point")
+    parser.add_argument("--at", type=float, default=200, help="simulated second of the flight the variants start from")
+    parser.add_argument("--snapshot", default=None, help="start from this snapshot file instead of flying to --at")
+    parser.add_argument("--save-snapshot", default=None, help="write the snapshot to this file")
+    parser.add_argument("--wall-gains", nargs="+", type=parse_gains, default=[DEFAULT_GAINS["wall_pid_gains"]],
+                        help="P,I,D,max_I of the wall distance controller")
+    parser.add_argument("--forward-gains", nargs="+", type=parse_gains, default=[DEFAULT_GAINS["forward_pid_gains"]],
+                        help="P,I,D,max_I of the forward distance controller")
+    parser.add_argument("--narrow-gains", nargs="+", type=parse_gains, default=[DEFAULT_GAINS["narrow_pid_gains"]],
+                        help="P,I,D,max_I of the narrow path controller")
+    parser.add_argument("--max-time", type=float, default=480, help="maximum simulated flight time in seconds, from the start of the flight")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU core)")
+    parser.add_argument("--output", default="fork_results.csv", help="results file")
+    args = parser.parse_args()
+
+    if args.snapshot:
+        with open(args.snapshot, "rb") as snapshot_file:
+            snapshot = snapshot_file.read()
+    elif args.map_path:
+        simulation = HeadlessSimulation(args.map_path, seed=args.seed)
+        simulation.run(max_time=args.at)
+        snapshot = simulation.snapshot()
+    else:
+        parser.error("a map_path or a --snapshot is needed")
+    if args.save_snapshot:
+        with open(args.save_snapshot, "wb") as snapshot_file:
+            snapshot_file.write(snapshot)
+
+    variants = [{"pid_gains": {"wall_pid_gains": wall, "forward_pid_gains": forward, "narrow_pid_gains": narrow}}
+                for wall, forward, narrow in itertools.product(args.wall_gains, args.forward_gains, args.narrow_gains)]
+    with open(args.output, "w", newline="") as results_file:
+        writer = csv.DictWriter(results_file, fieldnames=RESULTS_FIELDS)
+        writer.writeheader()
+        for index, (variant, stats) in enumerate(zip(variants, fork(snapshot, variants, args.max_time, args.workers))):
+            pid_gains = variant["pid_gains"]
+            writer.writerow({
+                "variant": index,
+                "wall_pid_gains": format_gains(pid_gains["wall_pid_gains"]),
+                "forward_pid_gains": format_gains(pid_gains["forward_pid_gains"]),
+                "narrow_pid_gains": format_gains(pid_gains["narrow_pid_gains"]),
+                "coverage": f"{stats['coverage']:.4f}",
+                "crashes": stats["crashes"],
+                "sim_time": f"{stats['sim_time']:.2f}",
+                "returned_home": stats["returned_home"],
+                "time_to_return": f"{stats['time_to_return']:.2f}" if stats["returned_home"] else "",
+                "battery": f"{stats['battery']:.1f}",
+            })
+            print(f"[{index + 1}/{len(variants)}] coverage={stats['coverage']:.2f} % crashes={stats['crashes']} returned_home={stats['returned_home']}")
+    print(f"Results written to {os.path.abspath(args.output)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import math
+import numpy as np
+
+'''
+FrontierPlanner class - picks the frontier of an ExplorationMap to explore next and the way to it.
+a breadth-first search spreads from the drone's cell over the free cells, one ring of cells per step, and stops
+search_slack steps after it reached the first frontier. of the frontiers it reached, the one with the shortest way
+plus turn_cost steps per half turn the drone has to make to face it wins, so the drone keeps flying ahead instead of
+going back and forth between frontiers which are about as far.
+'''
+class FrontierPlanner:
+    def __init__(self, exploration_map, turn_cost=8, search_slack=8):
+        self.exploration_map = exploration_map
+        self.turn_cost = turn_cost
+        self.search_slack = search_slack
+
+    # the cells and the 8 cells around each one of them
+    def grow(self, cells):
+        grown = cells.copy()
+        grown[1:, :] |= cells[:-1, :]
+        grown[:-1, :] |= cells[1:, :]
+        grown[:, 1:] |= grown[:, :-1].copy()
+        grown[:, :-1] |= grown[:, 1:].copy()
+        return grown
+
+    # the steps from the drone's cell to every cell the search reached, -1 for the cells it did not reach
+    def get_distances(self, start, frontier_cells, passable):
+        passable = passable.copy()
+        passable[start] = True
+        distances = np.full(passable.shape, -1, dtype=np.int32)
+        distances[start] = 0
+        reached = np.zeros(passable.shape, dtype=bool)
+        reached[start] = True
+        ring = reached.copy()
+        distance, last_distance = 0, None
+        while ring.any() and (last_distance is None or distance < last_distance):
+            if last_distance is None and (ring & frontier_cells).any():
+                last_distance = distance + self.search_slack
+            grown = np.zeros(passable.shape, dtype=bool)
+            grown[1:, :] |= ring[:-1, :]
+            grown[:-1, :] |= ring[1:, :]
+            grown[:, 1:] |= ring[:, :-1]
+            grown[:, :-1] |= ring[:, 1:]
+            ring = grown & passable & ~reached
+            reached |= ring
+            distance += 1
+            distances[ring] = distance
+        return distances
+
+    '''
+    the way from position to the best frontier, as the centers of the cells along it, without the drone's own cell.
+    returns None if no frontier can be reached.
+    '''
+    def plan(self, position, orientation):
+        exploration_map = self.exploration_map
+        frontiers = exploration_map.get_frontiers()
+        if not frontiers:
+            return None
+        frontier_cells = np.zeros(exploration_map.free_cells.shape, dtype=bool)
+        rows, columns = zip(*frontiers)
+        frontier_cells[list(rows), list(columns)] = True
+        start = exploration_map.cell_of(position)
+        # keep a cell away from the obstacles when there is such a way, the drone flies through the middle of the cells
+        passable = (exploration_map.free_cells & ~self.grow(exploration_map.blocked_cells)) | frontier_cells
+        distances = self.get_distances(start, frontier_cells, passable)
+        if not (distances[frontier_cells] > 0).any():
+            distances = self.get_distances(start, frontier_cells, exploration_map.free_cells)
+
+        best, best_cost = None, None
+        for cell in frontiers:
+            if distances[cell] <= 0:
+                continue
+            x, y = exploration_map.cell_center(cell)
+            turn = abs((math.degrees(math.atan2(y - position[1], x - position[0])) - orientation + 180) % 360 - 180)
+            cost = distances[cell] + self.turn_cost * turn / 180
+            if best_cost is None or cost < best_cost:
+                best, best_cost = cell, cost
+        if best is None:
+            return None
+
+        # walk back from the frontier, every step to a cell one step closer to the drone
+        path = [best]
+        row, column = best
+        while distances[row, column] > 1:
+            for next_row, next_column in ((row - 1, column), (row + 1, column), (row, column - 1), (row, column + 1)):
+                if (0 <= next_row < distances.shape[0] and 0 <= next_column < distances.shape[1] and
+                        distances[next_row, next_column] == distances[row, column] - 1):
+                    row, column = next_row, next_column
+                    break
+            path.append((row, column))
+        path.reverse()
+        return [exploration_map.cell_center(cell) for cell in path]
@@ -0,0 +1,133 @@
+import argparse
+import csv
+import itertools
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from BatchRunner import DEFAULT_GAINS, format_gains
+from HeadlessSimulation import HeadlessSimulation
+from MapCache import MapCache
+
+'''
+searches the gains of the wall, forward and narrow controllers with successive halving: every generation samples
+candidates around the best gains so far, flies each of them on every map x seed for a short time, keeps the best
+1 / eta of them and flies the survivors eta times longer, until one is left after a full flight. a flight stops at its
+first crash, and a candidate which crashed is ranked below every candidate which did not, so the bad gains are
+dropped after a few seconds of flight instead of flying the whole 8 minutes. the next generation samples around the
+winner with a smaller step, like an evolution strategy.
+'''
+
+# the columns of the results file, one row per candidate per rung
+RESULTS_FIELDS = ["generation", "rung", "candidate", "max_time", "wall_pid_gains", "forward_pid_gains", "narrow_pid_gains",
+                  "coverage", "crashed_flights", "flights"]
+
+# one flight of a rung, runs in a worker process, stops at the first crash
+def run_flight(job):
+    map_path, seed, pid_gains, max_time = job
+    simulation = HeadlessSimulation(map_path, seed=seed, pid_gains=pid_gains)
+    stats = simulation.run(max_time=max_time, stop_on_crash=True)
+    return stats["coverage"], stats["crashes"] > 0
+
+# multiplies every gain but max I by a log-normal factor, a gain of 0 stays 0 (the hand-tuned I terms are off)
+def sample_gains(center, step, rng):
+    gains = {}
+    for name, (p, i, d, max_i) in center.items():
+        p, i, d = (gain * math.exp(rng.gauss(0, step)) for gain in (p, i, d))
+        gains[name] = (round(p, 4), round(i, 4), round(d, 4), max_i)
+    return gains
+
+# higher is better: no crashed flight first, then the mean coverage
+def score(result):
+    coverages, crashed = result
+    return (-sum(crashed), sum(coverages) / len(coverages))
+
+'''
+one generation of successive halving over candidates (a list of gains dicts). returns the winner and its result,
+which is (coverages, crashed) of its flights on every map x seed in its last rung.
+'''
+def run_generation(executor, candidates, map_paths, seeds, min_time, max_time, eta, generation, writer=None):
+    rung = 0
+    flight_time = min_time
+    alive = list(range(len(candidates)))
+    while True:
+        jobs = [(map_path, seed, candidates[candidate], flight_time)
+                for candidate, map_path, seed in itertools.product(alive, map_paths, seeds)]
+        flights = list(executor.map(run_flight, jobs))
+        flights_per_candidate = len(map_paths) * len(seeds)
+        results = {}
+        for position, candidate in enumerate(alive):
+            candidate_flights = flights[position * flights_per_candidate:(position + 1) * flights_per_candidate]
+            results[candidate] = ([coverage for coverage, _ in candidate_flights], [crashed for _, crashed in candidate_flights])
+            if writer is not None:
+                coverages, crashed = results[candidate]
+                gains = candidates[candidate]
+                writer.writerow({
+                    "generation": generation, "rung": rung, "candidate": candidate, "max_time": f"{flight_time:g}",
+                    "wall_pid_gains": format_gains(gains["wall_pid_gains"]),
+                    "forward_pid_gains": format_gains(gains["forward_pid_gains"]),
+                    "narrow_pid_gains": format_gains(gains["narrow_pid_gains"]),
+                    "coverage": f"{sum(coverages) / len(coverages):.4f}", "crashed_flights": sum(crashed),
+                    "flights": len(crashed),
+                })
+        alive.sort(key=lambda candidate: score(results[candidate]), reverse=True)
+        best_coverages, best_crashed = results[alive[0]]
+        print(f"generation {generation} rung {rung}: {len(alive)} candidates flew {flight_time:g} s, best coverage "
+              f"{sum(best_coverages) / len(best_coverages):.2f} % with {sum(best_crashed)} crashed flights")
+        if len(alive) == 1 and flight_time >= max_time:
+            return candidates[alive[0]], results[alive[0]]
+        alive = alive[:max(len(alive) // eta, 1)]
+        flight_time = min(flight_time * eta, max_time)
+        rung += 1
+
+'''
+runs the generations and returns the best gains with their result. generation 0 samples around start_gains
+(start_gains itself is one of the candidates, so the search never ends worse than where it started on these flights).
+'''
+def optimize(map_paths, seeds, generations=3, candidates_count=16, min_time=15, max_time=480, eta=2, step=0.5,
+             start_gains=None, workers=None, random_seed=0, writer=None):
+    rng = random.Random(random_seed)
+    best_gains = dict(start_gains or DEFAULT_GAINS)
+    # preprocess every map once before the workers start, they all map the same cached files
+    map_cache = MapCache()
+    for map_path in sorted(set(map_paths)):
+        map_cache.load(map_path, 1366, 768, int(10 / 2.5))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for generation in range(generations):
+            candidates = [best_gains] + [sample_gains(best_gains, step, rng) for _ in range(candidates_count - 1)]
+            best_gains, best_result = run_generation(executor, candidates, map_paths, seeds, min_time, max_time, eta, generation, writer)
+            step /= 2
+    return best_gains, best_result
+
+
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    maps_folder = os.path.join(os.path.dirname(script_dir), 'maps')
+
+    parser = argparse.ArgumentParser(description="Search the PID gains with successive halving of headless flights on all CPU cores")
+    parser.add_argument("--maps", nargs="+", default=None, help="map images (default: every map in the maps folder)")
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0, 1], help="spawn point seeds every candidate flies")
+    parser.add_argument("--generations", type=int, default=3, help="rounds of sampling around the best gains")
+    parser.add_argument("--candidates", type=int, default=16, help="gain sets sampled per generation")
+    parser.add_argument("--min-time", type=float, default=15, help="simulated seconds of the first, shortest flights")
+    parser.add_argument("--max-time", type=float, default=480, help="simulated seconds of the last, full flights")
+    parser.add_argument("--eta", type=int, default=2, help="1 / eta of the candidates survive a rung, and fly eta times longer")
+    parser.add_argument("--step", type=float, default=0.5, help="standard deviation of the log of the gains' factors, halved every generation")
+    parser.add_argument("--random-seed", type=int, default=0, help="seed of the sampling of the candidates")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU core)")
+    parser.add_argument("--output", default="gain_search.csv", help="results of every candidate on every rung")
+    args = parser.parse_args()
+
+    map_paths = args.maps or sorted(os.path.join(maps_folder, f) for f in os.listdir(maps_folder) if f.endswith(('png', 'jpg', 'jpeg')))
+    with open(args.output, "w", newline="") as results_file:
+        writer = csv.DictWriter(results_file, fieldnames=RESULTS_FIELDS)
+        writer.writeheader()
+        best_gains, (coverages, crashed) = optimize(map_paths, args.seeds, args.generations, args.candidates, args.min_time,
+                                                    args.max_time, args.eta, args.step, workers=args.workers,
+                                                    random_seed=args.random_seed, writer=writer)
+    for name, gains in best_gains.items():
+        print(f"--{name.replace('_pid_gains', '')}-gains {format_gains(gains)}")
+    print(f"Coverage: {sum(coverages) / len(coverages):.2f} % over {len(coverages)} flights, {sum(crashed)} crashed")
+
+if __name__ == "__main__":
+    main()
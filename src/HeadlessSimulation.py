@@ -0,0 +1,313 @@
+import argparse
+import io
+import pickle
+import random
+import math
+import os
+import types
+import zlib
+import numpy as np
+from CoverageMap import CoverageMap
+from Drone import Drone
+from FlightRecorder import FlightRecorder
+from MapCache import MapCache
+from Profiler import Profiler
+from TelemetryServer import TelemetryServer
+from Trail import Trail
+
+# HeadlessSimulation class - runs the drone's autonomy on a simulated clock, without pygame
+class HeadlessSimulation:
+    def __init__(self, map_path, map_width=1366, map_height=768, physics_rate=60, sensors_rate=10, seed=None, clock=None, pid_gains=None, map_cache=None, exploration_mode="wall_following", native_resolution=False):
+        self.map_width = map_width
+        self.map_height = map_height
+        # fly the map at the size of its image, in memory-mapped tiles, instead of resizing it to map_width x map_height
+        self.native_resolution = native_resolution
+        self.physics_rate = physics_rate  # control/physics ticks per simulated second
+        self.sensors_rate = sensors_rate  # sensors updates per simulated second (10 Hz like the real sensors)
+        self.physics_dt = 1 / physics_rate
+        self.random = random.Random(seed)  # own generator so a seed reproduces a whole flight
+
+        # simulated clock, advanced only by step()
+        self.ticks = 0
+        self.sensors_updates = 0
+        self.sim_time = 0
+
+        self.drone_radius = int(10 / 2.5)  # Convert cm to pixels
+        self.map_cache = map_cache if map_cache is not None else MapCache()  # the preprocessed maps on disk
+        self.load_map(map_path)
+
+        # Initialize drone, by default the drone's cooldowns are measured on the simulated clock
+        # pid_gains can replace the gains of the drone's controllers, e.g. {"wall_pid_gains": (0.07, 0, 0.05, 5)}
+        self.drone = Drone(clock=clock if clock is not None else self.get_sim_time, exploration_mode=exploration_mode,
+                           physics_dt=self.physics_dt, **(pid_gains or {}))
+        self.drone_pos = None
+        self.respawn_drone()
+
+        # drone positions for leaving a trail
+        self.drone_positions = Trail()
+        self.crashes = 0
+        self.return_start_time = None  # the simulated time the drone started returning home
+        self.recorder = None  # a FlightRecorder which logs every tick
+        self.telemetry = None  # a TelemetryServer which streams every tick
+
+        # timing of the hot paths, off until enabled
+        self.profiler = Profiler()
+        self.register_profiled_phases()
+
+        self.drone.set_starting_position(self.drone_pos)
+
+    # the phases the profiler times, phases which call other phases include their time
+    def register_profiled_phases(self):
+        for method_name in ["update_sensors", "wall_following", "is_in_trail_environment", "update_exploration_map", "frontier_following", "update_position_by_algorithm"]:
+            self.profiler.register(self.drone, method_name, "drone." + method_name)
+        for method_name in ["step", "update_coverage", "check_collision", "check_move_legality"]:
+            self.profiler.register(self, method_name)
+
+    def get_sim_time(self):
+        return self.sim_time
+
+    # loads the map and returns the resized image, so a front-end can display it (None at native resolution)
+    def load_map(self, filename):
+        self.map_path = filename
+        if self.native_resolution:
+            map_img, self.map_matrix = None, self.map_cache.load_tiled(filename, self.drone_radius)
+            self.map_width, self.map_height = self.map_matrix.width, self.map_matrix.height
+        else:
+            map_img, self.map_matrix = self.map_cache.load(filename, self.map_width, self.map_height, self.drone_radius)
+        self.collision_mask = self.map_matrix.get_collision_mask(self.drone_radius)
+        # Bitmap to remember painted pixels
+        self.coverage = CoverageMap(self.map_matrix)
+        # Count initial white pixels
+        self.total_white_pixels = self.count_white_pixels()
+        return map_img
+
+    def count_white_pixels(self):
+        return self.map_matrix.count_free_cells()
+
+    # draws the respawn point directly from the free positions, instead of retrying random points until one is free
+    def respawn_drone(self):
+        free_positions = self.map_matrix.get_free_positions(self.drone_radius)
+        position = int(free_positions[self.random.randrange(len(free_positions))])
+        self.drone_pos = [position % self.map_width, position // self.map_width]
+
+    # (x, y) must be inside the map - the obstacles around every pixel are precomputed in the map's collision mask
+    def check_collision(self, x, y):
+        return bool(self.collision_mask[int(y), int(x)])
+
+    # checks if the drone is inside the map and also is not collided, if it did reset the simulation
+    def check_move_legality(self, new_pos):
+        if (self.drone_radius <= new_pos[0] < self.map_width - self.drone_radius and
+                self.drone_radius <= new_pos[1] < self.map_height - self.drone_radius):
+            if not self.check_collision(new_pos[0], new_pos[1]):
+                self.drone_pos = new_pos
+                self.drone.update_position(new_pos)  # Track the trail
+                self.drone_positions.append(self.drone_pos)  # Add position to the trail
+                return
+        self.crashes += 1
+        self.reset_simulation()
+
+    def update_sensors(self):
+        self.drone.update_sensors(self.map_matrix, self.drone_pos, self.drone_radius, self.drone.orientation_sensor.drone_orientation)
+
+    # marks the points seen by the left and right sensors as covered, returns the x's and y's of the newly covered points
+    def update_coverage(self):
+        def get_detected_points(sensor_distance, angle_offset):
+            angle_rad = math.radians((self.drone.orientation_sensor.drone_orientation + angle_offset) % 360)
+            dists = np.arange(1, int(min(sensor_distance, 300) / 2.5) + 1)
+            xs = self.drone_pos[0] + dists * math.cos(angle_rad)
+            ys = self.drone_pos[1] + dists * math.sin(angle_rad)
+            inside = (xs >= 0) & (xs < self.map_width) & (ys >= 0) & (ys < self.map_height)
+            xs, ys = xs[inside].astype(np.int64), ys[inside].astype(np.int64)
+            free = self.map_matrix.cells[ys, xs] == 0  # Check if the point is in the white area
+            return xs[free], ys[free]
+
+        # Get detected points for left and right sensors
+        left_xs, left_ys = get_detected_points(self.drone.leftward_distance_sensor.distance, -90)
+        right_xs, right_ys = get_detected_points(self.drone.rightward_distance_sensor.distance, 90)
+
+        # cover the points and all the points within a radius of 2 around them
+        return self.coverage.stamp(np.concatenate((left_xs, right_xs)), np.concatenate((left_ys, right_ys)))
+
+    def calculate_yellow_percentage(self):
+        percentage = (self.coverage.covered_count / self.total_white_pixels) * 100
+        return percentage
+
+    def reset_simulation(self):
+        self.coverage.clear()  # Clear detected points
+        self.respawn_drone()  # Respawn the drone
+        self.drone_positions.clear()  # Clear trail
+        self.drone.optical_flow_sensor.reset_sensor()
+        self.drone.battery_sensor.reset_battrey()
+        #making the drone start flying
+        self.drone.optical_flow_sensor.update_speed_acceleration()
+        #the drone starts a new flight from the respawn point
+        self.drone.returning_to_start = False
+        self.return_start_time = None
+        self.drone.set_starting_position(self.drone_pos)
+
+    # the drone's next position for this tick, a front-end can override it e.g. for manual flight
+    def move_drone_one_tick(self):
+        return self.drone.update_position_by_algorithm(self.drone_pos, self.physics_dt)
+
+    # advances the simulation by one physics tick of the simulated clock, returns the newly covered points
+    def step(self):
+        # sensors are sampled at sensors_rate in simulated time, independently of the physics rate
+        if self.sensors_updates * self.physics_rate <= self.ticks * self.sensors_rate:
+            self.update_sensors()
+            self.sensors_updates += 1
+
+        self.drone_pos = self.move_drone_one_tick()
+        if self.drone.returning_to_start and self.return_start_time is None:
+            self.return_start_time = self.sim_time
+        #checking if the drone crashing into the wall or not
+        self.check_move_legality(self.drone_pos)
+        new_points = self.update_coverage()
+
+        self.ticks += 1
+        self.sim_time = self.ticks / self.physics_rate
+        if self.recorder is not None:
+            self.recorder.record(self)
+        if self.telemetry is not None:
+            self.telemetry.publish(self, new_points)
+        return new_points
+
+    # flies until the drone is back home, its battery is empty or max_time simulated seconds have passed
+    def run(self, max_time=480, stop_on_crash=False):
+        max_ticks = int(max_time * self.physics_rate)
+        #making the drone start flying, a flight restored from a snapshot is flying already
+        if self.ticks == 0:
+            self.drone.optical_flow_sensor.update_speed_acceleration()
+        while self.ticks < max_ticks:
+            self.step()
+            if self.drone.is_back_home() or self.drone.battery_sensor.get_battrey_precentage() <= 0:
+                break
+            if stop_on_crash and self.crashes > 0:
+                break
+        return self.get_stats()
+
+    '''
+    the state of the flight as compressed bytes: the clock, the random generator, the drone with its sensors, PID
+    controllers, trail, plans and flags, the position, the trail, the crashes and the coverage. the map and the
+    simulated clock are referred to instead of copied, restore() connects them to its own simulation's.
+    '''
+    def snapshot(self):
+        profiling = self.profiler.enabled
+        self.profiler.disable()  # the timed wrappers are not part of the drone
+        try:
+            state = io.BytesIO()
+            pickler = pickle.Pickler(state, pickle.HIGHEST_PROTOCOL)
+            pickler.persistent_id = self.get_shared_name
+            pickler.dump({
+                "ticks": self.ticks, "sensors_updates": self.sensors_updates, "sim_time": self.sim_time,
+                "random": self.random.getstate(), "drone": self.drone, "drone_pos": self.drone_pos,
+                "drone_positions": self.drone_positions, "crashes": self.crashes, "return_start_time": self.return_start_time,
+                "coverage": self.coverage.get_state(),
+            })
+        finally:
+            if profiling:
+                self.profiler.enable()
+        return zlib.compress(pickle.dumps({
+            "map_path": self.map_path, "map_hash": MapCache.hash_map(self.map_path), "map_width": self.map_width, "map_height": self.map_height,
+            "native_resolution": self.native_resolution, "physics_rate": self.physics_rate,
+            "sensors_rate": self.sensors_rate, "state": state.getvalue(),
+        }, pickle.HIGHEST_PROTOCOL))
+
+    # the name a snapshot stores instead of an object of this simulation: the map or one of its methods (the clock)
+    def get_shared_name(self, obj):
+        if obj is self.map_matrix:
+            return "map_matrix"
+        if isinstance(obj, types.MethodType) and obj.__self__ is self:
+            return obj.__func__.__name__
+        return None
+
+    def get_shared_object(self, name):
+        return self.map_matrix if name == "map_matrix" else getattr(self, name)
+
+    # continues the flight of a snapshot of a simulation on the same map, flying on from here is the same flight
+    def restore(self, snapshot):
+        snapshot = pickle.loads(zlib.decompress(snapshot))
+        # the trail, coverage and belief map only match the walls of the map they were flown on
+        if snapshot["map_hash"] != MapCache.hash_map(self.map_path):
+            raise ValueError(f"the snapshot was taken on another map than {self.map_path}")
+        if (snapshot["map_width"], snapshot["map_height"], snapshot["physics_rate"], snapshot["sensors_rate"]) != \
+                (self.map_width, self.map_height, self.physics_rate, self.sensors_rate):
+            raise ValueError("the snapshot was taken on a map of another size or with other rates")
+        unpickler = pickle.Unpickler(io.BytesIO(snapshot["state"]))
+        unpickler.persistent_load = self.get_shared_object
+        state = unpickler.load()
+
+        self.ticks, self.sensors_updates, self.sim_time = state["ticks"], state["sensors_updates"], state["sim_time"]
+        self.random.setstate(state["random"])
+        self.drone_pos = state["drone_pos"]
+        self.drone_positions = state["drone_positions"]
+        self.crashes = state["crashes"]
+        self.return_start_time = state["return_start_time"]
+        self.coverage.set_state(state["coverage"])
+
+        # the profiler times the restored drone instead of the one it replaces
+        profiling = self.profiler.enabled
+        self.profiler.disable()
+        self.profiler.targets = [(state["drone"] if obj is self.drone else obj, method_name, phase)
+                                 for obj, method_name, phase in self.profiler.targets]
+        self.drone = state["drone"]
+        if profiling:
+            self.profiler.enable()
+
+    # a new simulation on the snapshot's map which continues its flight
+    @classmethod
+    def from_snapshot(cls, snapshot, map_cache=None):
+        header = pickle.loads(zlib.decompress(snapshot))
+        simulation = cls(header["map_path"], header["map_width"], header["map_height"], header["physics_rate"],
+                         header["sensors_rate"], map_cache=map_cache, native_resolution=header["native_resolution"])
+        simulation.restore(snapshot)
+        return simulation
+
+    def get_stats(self):
+        returned_home = self.drone.is_back_home()
+        return {
+            "coverage": self.calculate_yellow_percentage(),
+            "crashes": self.crashes,
+            "sim_time": self.sim_time,
+            "returned_home": returned_home,
+            "time_to_return": self.sim_time - self.return_start_time if returned_home else None,
+            "battery": self.drone.battery_sensor.get_battrey_precentage(),
+            "trail": self.drone_positions,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a drone flight without a display, as fast as the CPU allows")
+    parser.add_argument("map_path", help="path to the map image")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the drone's spawn point")
+    parser.add_argument("--max-time", type=float, default=480, help="maximum simulated flight time in seconds")
+    parser.add_argument("--exploration", choices=["wall_following", "frontier"], default="wall_following", help="how the drone explores the map")
+    parser.add_argument("--native", action="store_true", help="fly the map at the size of its image (2.5 cm per pixel) instead of resizing it to 1366x768")
+    parser.add_argument("--record", default=None, help="write every tick of the flight to this flight log")
+    parser.add_argument("--telemetry", type=int, default=None, help="stream every tick to subscribers on this local port")
+    parser.add_argument("--profile", default=None, help="time the hot paths and write the timings to this file")
+    args = parser.parse_args()
+
+    simulation = HeadlessSimulation(args.map_path, seed=args.seed, exploration_mode=args.exploration, native_resolution=args.native)
+    if args.profile:
+        simulation.profiler.enable()
+    if args.record:
+        simulation.recorder = FlightRecorder(args.record, simulation.physics_rate, simulation.sensors_rate,
+                                             args.seed, os.path.basename(args.map_path))
+    if args.telemetry is not None:
+        simulation.telemetry = TelemetryServer(args.telemetry)
+    stats = simulation.run(max_time=args.max_time)
+    if args.record:
+        simulation.recorder.close()
+    if args.telemetry is not None:
+        simulation.telemetry.close()
+    if args.profile:
+        simulation.profiler.dump(args.profile)
+    print(f"Coverage: {stats['coverage']:.2f} %")
+    print(f"Crashes: {stats['crashes']}")
+    print(f"Simulated time: {stats['sim_time']:.1f} s")
+    print(f"Returned home: {stats['returned_home']}")
+    print(f"Battery: {stats['battery']:.1f} %")
+    print(f"Trail length: {len(stats['trail'])}")
+
+if __name__ == "__main__":
+    main()
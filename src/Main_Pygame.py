@@ -1,30 +1,34 @@
 import pygame
-from PIL import Image
-import random
-import math
+import argparse
 import os
-from Drone import Drone
+from FlightRecorder import FlightRecorder
+from HeadlessSimulation import HeadlessSimulation
+from MapPrefetcher import MapPrefetcher
+from PygameRenderer import PygameRenderer
+from TelemetryServer import TelemetryServer
 import time
 
-# DroneSimulation class
-class DroneSimulation:
-    def __init__(self):
+# DroneSimulation class - the pygame front-end of the simulation
+class DroneSimulation(HeadlessSimulation):
+    def __init__(self, physics_rate=60, speed_factor=1, exploration_mode="wall_following", seed=None):
         pygame.init()
-        self.map_width = 1366
-        self.map_height = 768
-        self.screen_width = self.map_width + 100  # Increase width by some pixels
-        self.screen_height = self.map_height + 32  # Increase height by some pixels
+        map_width = 1366
+        map_height = 768
+        self.screen_width = map_width + 100  # Increase width by some pixels
+        self.screen_height = map_height + 32  # Increase height by some pixels
         self.screen = pygame.display.set_mode((self.screen_width, self.screen_height))
         self.last_key_state = pygame.key.get_pressed() #for button pressing
         pygame.display.set_caption("Drone Simulation")
         self.show_legend = True  # Flag to control legend visibility
+        self.show_rendering = True  # Flag to skip drawing, the simulation keeps running
+        self.is_autonomous = True # a flag for enabling/disabling autonomous flight mode
+        self.speed_factor = speed_factor  # how many simulated seconds pass in every real second
 
         # Load map
         script_dir = os.path.dirname(os.path.abspath(__file__))
         parent_directory = os.path.dirname(script_dir)
         input_filepath = os.path.join(parent_directory, 'maps')
         self.load_map_paths(input_filepath)  # Update with the correct path to your maps folder
-        self.load_map(self.map_paths[self.current_map_index])
 
         self.sensor_texts = {
             "Autonomous_Mode": "Autonomous Mode: True",
@@ -36,85 +40,29 @@ class DroneSimulation:
             "IMU": "IMU: 0",
             "Drone's battery": "0 %",
             "Drone's speed": "0",
-            "Yellow_Percentage": "Yellow Percentage: 0.00%"
+            "Yellow_Percentage": "Yellow Percentage: 0.00%",
+            "Fast_Forward": "Fast Forward: x1"
         }
 
-        # Initialize drone
-        self.drone_radius = int(10 / 2.5)  # Convert cm to pixels
-        self.drone = Drone()
-        self.drone_pos = None
-        self.respawn_drone()
+        # the live view runs on the simulated clock as well, so fast-forwarding speeds up the whole flight
+        super().__init__(self.map_paths[self.current_map_index], map_width, map_height, physics_rate=physics_rate, exploration_mode=exploration_mode,
+                         seed=seed, map_cache=MapPrefetcher())
 
+        self.profile_texts = {}  # the profiler's timings, shown while it is enabled
+        self.renderer = PygameRenderer(self)
+        self.profiler.register(self.renderer, "draw", "render")
         self.clock = pygame.time.Clock()
         self.game_over = False
+        self.record_path = None  # the path of the first flight log, the next flights' logs are named after it
+        self.recorded_flights = 0
 
-        # List to store drone positions for leaving a trail
-        self.drone_positions = []
-
-        # Array to remember painted pixels
-        self.detected_pixels = set()
-        self.detected_yellow_pixels = set()
-
-        # Count initial white pixels
-        self.total_white_pixels = self.count_white_pixels()
-
-        self.drone.set_starting_position(self.drone_pos)
-
+    # the next map is prefetched in the background while this one flies, so switching to it does not freeze the window
     def load_map(self, filename):
-        map_img = Image.open(filename)
-        map_img = map_img.resize((self.map_width, self.map_height))
+        map_img = super().load_map(filename)
         self.map_img = pygame.image.fromstring(map_img.tobytes(), map_img.size, map_img.mode)
-        self.map_matrix = self.convert_to_matrix(map_img)
-
-    def convert_to_matrix(self, img):
-        bw_img = img.convert("L")  # Convert to grayscale
-        threshold = 128  # Threshold value for black/white
-        bw_matrix = []
-        for y in range(self.map_height):
-            row = []
-            for x in range(self.map_width):
-                pixel = bw_img.getpixel((x, y))
-                if pixel < threshold:
-                    row.append(1)  # Black pixel
-                else:
-                    row.append(0)  # White pixel
-            bw_matrix.append(row)
-        return bw_matrix
-    
-    def count_white_pixels(self):
-        count = 0
-        for row in self.map_matrix:
-            count += row.count(0)
-        return count
-
-    def respawn_drone(self):
-        while True:
-            x = random.randint(self.drone_radius, self.map_width - self.drone_radius - 1)
-            y = random.randint(self.drone_radius, self.map_height - self.drone_radius - 1)
-            if not self.check_collision(x, y):
-                self.drone_pos = [x, y]
-                break
-
-    def check_collision(self, x, y):
-        for i in range(int(x - self.drone_radius), int(x + self.drone_radius)):
-            for j in range(int(y - self.drone_radius), int(y + self.drone_radius)):
-                if 0 <= i < self.map_width and 0 <= j < self.map_height:
-                    if self.map_matrix[j][i] == 1:
-                        return True
-        return False
-
-    # checks if the drone is inside the map and also is not collided, if it did reset the game
-    def check_move_legality(self , new_pos):
-        if (self.drone_radius <= new_pos[0] < self.map_width - self.drone_radius and
-                self.drone_radius <= new_pos[1] < self.map_height - self.drone_radius):
-            if not self.check_collision(new_pos[0], new_pos[1]):
-                self.drone_pos = new_pos
-                self.drone.update_position(new_pos)  # Track the trail
-                self.drone_positions.append(self.drone_pos[:])  # Add position to the trail
-            else:
-                self.reset_simulation()
-        else:
-            self.reset_simulation()
+        next_map_path = self.map_paths[(self.map_paths.index(filename) + 1) % len(self.map_paths)]
+        self.map_cache.prefetch(next_map_path, self.map_width, self.map_height, self.drone_radius)
+        return map_img
 
     # move with user input keys
     def move_drone_by_direction(self, direction = "forward"):  
@@ -124,113 +72,17 @@ class DroneSimulation:
     def update_drone_angle(self, angle_delta):
         self.drone.update_drone_angle(angle_delta)
 
-    def update_sensors(self):
-        self.drone.update_sensors(self.map_matrix, self.drone_pos, self.drone_radius, self.drone.orientation_sensor.drone_orientation)
-       
-    def paint_detected_points(self):
-        def get_detected_points(sensor_distance, angle_offset):
-            angle_rad = math.radians((self.drone.orientation_sensor.drone_orientation + angle_offset) % 360)
-            points = []
-            for dist in range(1, int(min(sensor_distance, 300) / 2.5) + 1):
-                x = self.drone_pos[0] + dist * math.cos(angle_rad)
-                y = self.drone_pos[1] + dist * math.sin(angle_rad)
-                if 0 <= x < self.map_width and 0 <= y < self.map_height:
-                    if self.map_matrix[int(y)][int(x)] == 0:  # Check if the point is in the white area
-                        points.append((int(x), int(y)))
-            return points
-
-        # Get detected points for left and right sensors
-        left_points = get_detected_points(self.drone.leftward_distance_sensor.distance, -90)
-        right_points = get_detected_points(self.drone.rightward_distance_sensor.distance, 90)
-
-        # Calculate the new points to be added
-        new_detected_points = set(left_points + right_points)
-        points_to_paint = new_detected_points - self.detected_pixels
-
-        # Function to get all points within a radius of 2 around a point
-        def get_points_in_radius(x, y, radius=2):
-            points = set()
-            for dx in range(-radius, radius + 1):
-                for dy in range(-radius, radius + 1):
-                    if dx * dx + dy * dy <= radius * radius:
-                        new_x, new_y = x + dx, y + dy
-                        if 0 <= new_x < self.map_width and 0 <= new_y < self.map_height:
-                            if self.map_matrix[new_y][new_x] == 0:  # Check if the point is in the white area
-                                points.add((new_x, new_y))
-            return points
-    
-
-        # Update the main set of detected pixels with the new points and their surrounding points
-        expanded_points_to_paint = set()
-        for x, y in points_to_paint:
-            expanded_points_to_paint.update(get_points_in_radius(x, y))
-
-        self.detected_pixels.update(expanded_points_to_paint)
-
-        # Create a surface for detected points if not exists
-        if not hasattr(self, 'detected_surface'):
-            self.detected_surface = pygame.Surface((self.map_width, self.map_height))
-            self.detected_surface.set_colorkey((0, 0, 0))  # Set transparent color
-
-        # Paint only the new points on the detected surface
-        for x, y in expanded_points_to_paint:
-           self.detected_surface.set_at((x, y), (255, 255, 0))
-
-        # Store detected points for yellow collection
-        self.detected_yellow_pixels.update(expanded_points_to_paint)
-
-        # Blit the detected surface onto the main screen
-        self.screen.blit(self.detected_surface, (0, 0))
+    def move_drone_one_tick(self):
+        if self.is_autonomous:
+            # Update drone position by algorithm
+            return super().move_drone_one_tick()
+        return self.drone.move_drone(self.drone_pos, "forward")
 
     def reset_simulation(self):
-        self.detected_pixels.clear()  # Clear detected points
-        self.respawn_drone()  # Respawn the drone
-        self.drone_positions.clear()  # Clear trail
-        # empty the surface, ensuring that no previously detected points are displayed on the screen.
-        if hasattr(self, 'detected_surface'):
-            self.detected_surface.fill((0, 0, 0))  # Fill the detected surface with black color
-        self.drone.optical_flow_sensor.reset_sensor()
-        self.drone.battery_sensor.reset_battrey()
-        self.detected_yellow_pixels.clear()  # Clear yellow detected points
+        super().reset_simulation()
+        # empty the coverage and the trail layers, ensuring that no previously detected points are displayed on the screen.
+        self.renderer.reset()
         self.sensor_texts["Yellow_Percentage"] = "Yellow Percentage: 0.00%"
-        #making the drone start flying
-        self.drone.optical_flow_sensor.update_speed_acceleration()
-        #clearing the drone trail array for wall switching
-        self.drone.trail.clear()
-        
-    def calculate_yellow_percentage(self):
-        yellow_pixels_count = len(self.detected_yellow_pixels)
-        percentage = (yellow_pixels_count / self.total_white_pixels) * 100
-        return percentage
-
-    def draw_legend_menu(self):
-        # Define the legend text
-        legend_texts = [
-            "Controls Legend:",
-            "L: Show/Hide Legend",
-            "Arrow Keys: Move Drone",
-            "A/D: Rotate Drone",
-            "Q: Switch Wall",
-            "R: Reset Simulation",
-            "E: Toggle Autonomous Mode",
-            "W: Increase Speed",
-            "S: Decrease Speed",
-            "M: Change Map"
-        ]
-
-        # Create a semi-transparent background for the legend
-        legend_surface = pygame.Surface((400, 300))
-        legend_surface.set_alpha(200)  # Transparency
-        legend_surface.fill((50, 50, 50))
-
-        # Render the legend text
-        font = pygame.font.SysFont(None, 24, bold=True)
-        for i, text in enumerate(legend_texts):
-            text_surface = font.render(text, True, (255, 255, 255))
-            legend_surface.blit(text_surface, (10, 10 + i * 30))
-
-        # Blit the legend surface onto the screen
-        self.screen.blit(legend_surface, (50, 50))
 
     def load_map_paths(self, folder_path):
         self.map_paths = [os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.endswith(('png', 'jpg', 'jpeg'))]
@@ -240,24 +92,52 @@ class DroneSimulation:
         self.current_map_index = (self.current_map_index + 1) % len(self.map_paths)
         self.load_map(self.map_paths[self.current_map_index])
         self.reset_simulation()
-
-
+        self.record_next_flight()
+
+    # records the flight into a flight log of the current map, seed is the seed the flight was flown with
+    def start_recording(self, path, seed=None):
+        self.record_path = path
+        self.recorded_flights = 1
+        self.recorder = FlightRecorder(path, self.physics_rate, self.sensors_rate, seed,
+                                       map_name=os.path.basename(self.map_paths[self.current_map_index]))
+
+    '''
+    a flight log holds one flight on one map: after the user switched the map or reset the flight, the rest is
+    recorded into a new log next to the first one (flight_2.bin, flight_3.bin, ...). the new flight does not start
+    from the seed's generator, so its log has no seed. a crash respawns the drone inside the same log, flagged.
+    '''
+    def record_next_flight(self):
+        if self.recorder is None:
+            return
+        self.recorder.close()
+        self.recorded_flights += 1
+        root, extension = os.path.splitext(self.record_path)
+        path = f"{root}_{self.recorded_flights}{extension}"
+        self.recorder = FlightRecorder(path, self.physics_rate, self.sensors_rate,
+                                       map_name=os.path.basename(self.map_paths[self.current_map_index]))
+        print(f"Recording the next flight to {path}")
+
+
+    '''
+    the simulation advances in fixed physics ticks of the simulated clock (sensors at 10 Hz, control at physics_rate),
+    as many ticks per frame as the real time which passed times the speed factor, while the frames are drawn
+    at whatever rate the display allows. the drone is drawn between its last two positions, by how far
+    the simulated clock got into the next tick.
+    '''
     def run_simulation(self):
-        
-        # Define the desired frequency (10 times per second)
-        frequency = 10  # Hz
-        interval = 1000 // frequency  # Convert frequency to milliseconds
-        sensors_update_timer = pygame.time.get_ticks()  # Initialize timer for sensors update
-        last_time = time.time()
-        is_autonomous = True # a flag for enabling/disabling autonomous flight mode
+        speed_factors = [1, 2, 4, 8, 16]
+        max_frame_time = 0.25  # after a stall, don't try to catch up more than this many real seconds
+        accumulator = 0
+        last_time = time.perf_counter()
+        profile_texts_time = last_time
         #PID_value_change = 0.005
         #making the drone start flying
         self.drone.optical_flow_sensor.update_speed_acceleration()
         while not self.game_over:
 
-            current_time_test = time.time()
-            dt = current_time_test - last_time
-            last_time = current_time_test
+            current_time = time.perf_counter()
+            frame_time = min(current_time - last_time, max_frame_time)
+            last_time = current_time
 
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
@@ -281,12 +161,21 @@ class DroneSimulation:
                 self.drone.switch_wall()
             if keys[pygame.K_r] and not self.last_key_state[pygame.K_r]:
                 self.reset_simulation()
+                self.record_next_flight()
             if keys[pygame.K_e] and not self.last_key_state[pygame.K_e]:
-                is_autonomous = not is_autonomous
+                self.is_autonomous = not self.is_autonomous
             if keys[pygame.K_l] and not self.last_key_state[pygame.K_l]:
                 self.show_legend = not self.show_legend  # Toggle the legend visibility
             if keys[pygame.K_m] and not self.last_key_state[pygame.K_m]:  # Key to change the map
                 self.load_next_map()
+            if keys[pygame.K_f] and not self.last_key_state[pygame.K_f]:  # Key to cycle the fast forward speed
+                next_index = (speed_factors.index(self.speed_factor) + 1) % len(speed_factors) if self.speed_factor in speed_factors else 0
+                self.speed_factor = speed_factors[next_index]
+            if keys[pygame.K_p] and not self.last_key_state[pygame.K_p]:
+                self.profiler.toggle()  # Toggle the timing of the hot paths
+            if keys[pygame.K_v] and not self.last_key_state[pygame.K_v]:
+                self.show_rendering = not self.show_rendering  # Toggle the drawing
+                self.renderer.full_redraw = True
             # Check if the right arrow key is pressed to update the speed
             if keys[pygame.K_w] and not self.last_key_state[pygame.K_w]:
                 self.drone.optical_flow_sensor.update_speed_acceleration()
@@ -312,42 +201,31 @@ class DroneSimulation:
             # if keys[pygame.K_6]:
             #     self.drone.pid_controller.update_D_value(-PID_value_change)
 
-            # Check if it's time to update the sensors , we want to update 10 times per second
-            current_time = pygame.time.get_ticks()
-            if current_time - sensors_update_timer >= interval:
-                # Update sensors
-                self.update_sensors()
-                sensors_update_timer = current_time  # Reset the timer
-            
-            if is_autonomous:
-                # Update drone position by algorithm
-                self.drone_pos = self.drone.update_position_by_algorithm(self.drone_pos, dt)
-            else:
-                self.move_drone_by_direction()
-            #checking if the drone crashing into the wall or not  
-            self.check_move_legality(self.drone_pos)
-                
-            # Blit the map image onto the screen
-            self.screen.blit(self.map_img, (0, 0))
-
-            # Paint detected points (yellow markers)
-            self.paint_detected_points()
+            # run the physics ticks which are due, the sensors are updated inside step() at 10 Hz of simulated time
+            accumulator += frame_time * self.speed_factor
+            previous_drone_pos = self.drone_pos
+            crashes = self.crashes
+            while accumulator >= self.physics_dt:
+                previous_drone_pos = self.drone_pos
+                # Paint detected points (yellow markers)
+                new_xs, new_ys = self.step()
+                self.renderer.paint_detected_points(new_xs, new_ys)
+                accumulator -= self.physics_dt
+            if self.crashes != crashes:
+                previous_drone_pos = self.drone_pos  # the drone respawned, there is nothing to interpolate from
+
+            # skip drawing entirely, the layers are still painted for when drawing is back on
+            if not self.show_rendering:
+                self.clock.tick(60)
+                continue
+
+            # draw the drone between its last two positions
+            alpha = accumulator / self.physics_dt
+            drawn_drone_pos = [previous_drone_pos[0] + (self.drone_pos[0] - previous_drone_pos[0]) * alpha,
+                               previous_drone_pos[1] + (self.drone_pos[1] - previous_drone_pos[1]) * alpha]
 
             yellow_percentage=self.calculate_yellow_percentage()
 
-            # Blit the drone trail onto the screen
-            for pos in self.drone_positions:
-                pygame.draw.circle(self.screen, (0, 0, 255), pos, 2)
-
-            # Draw arrow on the drone indicating its direction
-            angle_rad = math.radians(self.drone.orientation_sensor.drone_orientation)
-            end_x = self.drone_pos[0] + 15 * math.cos(angle_rad)
-            end_y = self.drone_pos[1] + 15 * math.sin(angle_rad)
-            pygame.draw.line(self.screen, (0, 0, 0), self.drone_pos, (end_x, end_y), 2)
-
-            # Blit the drone onto the screen
-            pygame.draw.circle(self.screen, (255, 0, 0), self.drone_pos, self.drone_radius)
-
             # Update sensor texts
             self.sensor_texts["forward"] = f"Forward: {self.drone.forward_distance_sensor.distance:.1f} cm"
             self.sensor_texts["backward"] = f"Backward: {self.drone.backward_distance_sensor.distance:.1f} cm"
@@ -357,29 +235,52 @@ class DroneSimulation:
             self.sensor_texts["Drone's battery"] = f"Drone's battery: {self.drone.battery_sensor.get_battrey_precentage():.1f} %"
             self.sensor_texts["Drone's speed"] = f"Drone's speed: {self.drone.optical_flow_sensor.get_current_speed():.1f}"
             self.sensor_texts["Yellow_Percentage"] = f"Yellow_Percentage: {yellow_percentage:.2f} %"
-            self.sensor_texts["Autonomous_Mode"] = f"Autonomous_Mode: {is_autonomous}"
-
-
-            # Display sensor texts
-            font_size = 24
-            font = pygame.font.SysFont(None, font_size)
-            for i, (key, text) in enumerate(self.sensor_texts.items()):
-                text_surface = font.render(text, True, (0, 204, 0))
-                self.screen.blit(text_surface, (0, self.map_height - 15 - i * 30))
-
-            # Draw legend menu if the flag is set
-            if self.show_legend:
-                self.draw_legend_menu()
-
-            pygame.display.update()
+            self.sensor_texts["Autonomous_Mode"] = f"Autonomous_Mode: {self.is_autonomous}"
+            self.sensor_texts["Fast_Forward"] = f"Fast Forward: x{self.speed_factor}"
+            # refresh the timings twice per second, re-rendering them every frame would be measured too
+            if not self.profiler.enabled:
+                self.profile_texts = {}
+            elif not self.profile_texts or current_time - profile_texts_time >= 0.5:
+                self.profile_texts = self.profiler.get_summary()
+                profile_texts_time = current_time
+
+
+            # Draw only what changed since the last frame
+            self.renderer.draw(drawn_drone_pos)
             self.clock.tick(60)
 
         pygame.quit()
 
 
 def main():
-    simulation = DroneSimulation()
+    parser = argparse.ArgumentParser(description="Drone simulation with a live pygame view")
+    parser.add_argument("--physics-rate", type=int, default=60, help="control/physics ticks per simulated second")
+    parser.add_argument("--speed", type=int, default=1, help="fast forward factor, simulated seconds per real second")
+    parser.add_argument("--exploration", choices=["wall_following", "frontier"], default="wall_following", help="how the drone explores the map")
+    parser.add_argument("--record", default=None, help="write every tick of the flight to this flight log")
+    parser.add_argument("--telemetry", type=int, default=None, help="stream every tick to subscribers on this local port")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the drone's spawn point (default: from the time, printed at start)")
+    parser.add_argument("--profile", default=None, help="time the hot paths from the start and write the timings to this file at exit")
+    args = parser.parse_args()
+
+    # the seed is always explicit, so a live flight (and its flight log) can be flown again with --seed
+    seed = args.seed if args.seed is not None else time.time_ns() % 2 ** 32
+    print(f"Seed: {seed}")
+    simulation = DroneSimulation(physics_rate=args.physics_rate, speed_factor=args.speed, exploration_mode=args.exploration, seed=seed)
+    if args.profile:
+        simulation.profiler.enable()
+    if args.record:
+        simulation.start_recording(args.record, seed)
+    if args.telemetry is not None:
+        simulation.telemetry = TelemetryServer(args.telemetry)
     simulation.run_simulation()
+    simulation.map_cache.close()
+    if args.record:
+        simulation.recorder.close()
+    if args.telemetry is not None:
+        simulation.telemetry.close()
+    if args.profile:
+        simulation.profiler.dump(args.profile)
 
 if __name__ == "__main__":
     main()
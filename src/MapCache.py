@@ -0,0 +1,124 @@
+import hashlib
+import os
+import numpy as np
+from PIL import Image
+from OccupancyGrid import OccupancyGrid
+from TiledArray import TiledArray
+from TiledOccupancyGrid import TiledOccupancyGrid
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(script_dir), 'map_cache')
+
+'''
+MapCache class - the preprocessed maps on disk: the resized image, the occupancy grid and the structures derived
+from it (clearance field, collision masks, free positions, free cells count), one .npy file each.
+an entry is keyed by the hash of the image's content and the resolution, so a map which changes gets a new entry.
+the files are loaded memory-mapped and read-only, so processes flying on the same map share one copy in memory.
+a map at its native resolution is cached in tiles instead (see TiledOccupancyGrid), built into the files one tile at a
+time. only building its cells decodes the source image (once), flying loads only the tiles around the drone.
+'''
+class MapCache:
+    version = 1  # part of the key, bump when the preprocessing changes so the old entries are not used
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir  # None keeps nothing on disk, every map is preprocessed again
+
+    # the sha256 of the map's file, which keys its entries
+    @staticmethod
+    def hash_map(map_path):
+        with open(map_path, "rb") as map_file:
+            return hashlib.sha256(map_file.read()).hexdigest()
+
+    def get_entry_dir(self, map_path, width, height):
+        digest = self.hash_map(map_path)
+        return os.path.join(self.cache_dir, f"{digest[:32]}_{width}x{height}_v{self.version}")
+
+    # returns the cached array, or computes it with build() and stores it
+    def get_array(self, entry_dir, name, build):
+        path = os.path.join(entry_dir, name + ".npy")
+        if not os.path.exists(path):
+            array = build()
+            # written under a temporary name and renamed, so another process never reads a half written file
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as array_file:
+                np.save(array_file, np.ascontiguousarray(array))
+            os.replace(temp_path, path)
+        # a plain array over the mapping, indexing a np.memmap goes through slower python code
+        return np.load(path, mmap_mode="r").view(np.ndarray)
+
+    # like get_array, but build(out) fills out, a writable memory-mapped array of the given shape, instead of returning it
+    def get_tiles(self, entry_dir, name, shape, dtype, build):
+        path = os.path.join(entry_dir, name + ".npy")
+        if not os.path.exists(path):
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            out = np.lib.format.open_memmap(temp_path, mode="w+", dtype=dtype, shape=shape)
+            build(out)
+            out.flush()
+            del out
+            os.replace(temp_path, path)
+        return np.load(path, mmap_mode="r").view(np.ndarray)
+
+    # the map resized to (width, height) and its occupancy grid with the derived structures for a drone of drone_radius
+    def load(self, map_path, width, height, drone_radius):
+        if self.cache_dir is None:
+            map_img = Image.open(map_path).resize((width, height))
+            map_matrix = OccupancyGrid.from_image(map_img)
+            map_matrix.get_collision_mask(drone_radius)
+            return map_img, map_matrix
+
+        entry_dir = self.get_entry_dir(map_path, width, height)
+        os.makedirs(entry_dir, exist_ok=True)
+        resized = []
+
+        def resize():
+            if not resized:
+                map_img = Image.open(map_path).resize((width, height))
+                if map_img.mode not in ("L", "RGB", "RGBA"):
+                    map_img = map_img.convert("RGBA")  # a mode an array can hold
+                resized.append(map_img)
+            return resized[0]
+
+        map_img = Image.fromarray(self.get_array(entry_dir, "image", lambda: np.asarray(resize())))
+        map_matrix = OccupancyGrid(self.get_array(entry_dir, "cells", lambda: OccupancyGrid.from_image(resize()).cells))
+        map_matrix.clearance = self.get_array(entry_dir, "clearance", map_matrix.get_clearance)
+        map_matrix.collision_masks[drone_radius] = self.get_array(
+            entry_dir, f"collision_mask_{drone_radius}", lambda: map_matrix.get_collision_mask(drone_radius))
+        map_matrix.free_positions[drone_radius] = self.get_array(
+            entry_dir, f"free_positions_{drone_radius}", lambda: map_matrix.get_free_positions(drone_radius))
+        map_matrix.free_cells_count = int(self.get_array(
+            entry_dir, "free_cells_count", lambda: np.array([map_matrix.count_free_cells()]))[0])
+        return map_img, map_matrix
+
+    # the occupancy grid of the map at its native resolution in tiles of tile_size, with the derived structures for a drone of drone_radius
+    def load_tiled(self, map_path, drone_radius, tile_size=256):
+        # the maps are our own floor plans, PIL's limit on the size of an image is lifted while one is loaded
+        max_image_pixels = Image.MAX_IMAGE_PIXELS
+        Image.MAX_IMAGE_PIXELS = None
+        try:
+            return self.build_tiled(map_path, drone_radius, tile_size)
+        finally:
+            Image.MAX_IMAGE_PIXELS = max_image_pixels
+
+    def build_tiled(self, map_path, drone_radius, tile_size):
+        if self.cache_dir is None:
+            map_matrix = TiledOccupancyGrid.from_image(Image.open(map_path), tile_size=tile_size)
+            map_matrix.get_collision_mask(drone_radius)
+            return map_matrix
+
+        map_img = Image.open(map_path)  # only the header is read until the cells are built
+        width, height = map_img.size
+        entry_dir = self.get_entry_dir(map_path, width, height) + f"_tiles{tile_size}"
+        os.makedirs(entry_dir, exist_ok=True)
+        shape = TiledArray.get_tiles_shape(width, height, tile_size)
+
+        cells = self.get_tiles(entry_dir, "cells", shape, np.uint8, lambda out: TiledOccupancyGrid.fill_cells_from_image(out, map_img))
+        map_img.close()  # the decoded image is not needed once the cells are built
+        map_matrix = TiledOccupancyGrid(TiledArray(cells, width, height))
+        map_matrix.clearance = TiledArray(self.get_tiles(entry_dir, "clearance", shape, np.uint8, map_matrix.fill_clearance), width, height)
+        map_matrix.collision_masks[drone_radius] = TiledArray(self.get_tiles(
+            entry_dir, f"collision_mask_{drone_radius}", shape, bool, lambda out: map_matrix.fill_collision_mask(drone_radius, out)), width, height)
+        map_matrix.free_positions_counts[drone_radius] = self.get_array(
+            entry_dir, f"free_positions_counts_{drone_radius}", lambda: map_matrix.count_free_positions(drone_radius))
+        map_matrix.free_cells_count = int(self.get_array(
+            entry_dir, "free_cells_count", lambda: np.array([map_matrix.count_free_cells()]))[0])
+        return map_matrix
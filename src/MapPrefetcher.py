@@ -0,0 +1,39 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from MapCache import MapCache
+
+'''
+MapPrefetcher class - loads maps through a MapCache on background worker threads, so switching to a map which was
+prefetched does not stall the caller. it keeps the max_maps most recently used maps ready (their images, occupancy
+grids and derived structures), and has the same load() as a MapCache, so a simulation can use either one.
+'''
+class MapPrefetcher:
+    def __init__(self, map_cache=None, max_maps=4, workers=1):
+        self.map_cache = map_cache if map_cache is not None else MapCache()
+        self.max_maps = max_maps
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="map-prefetch")
+        self.maps = OrderedDict()  # (map_path, width, height, drone_radius) -> future of (map_img, map_matrix), least recently used first
+
+    # starts loading the map in the background, if it is not loaded or loading already
+    def prefetch(self, map_path, width, height, drone_radius):
+        key = (map_path, width, height, drone_radius)
+        if key not in self.maps:
+            self.maps[key] = self.executor.submit(self.map_cache.load, map_path, width, height, drone_radius)
+            # the least recently used maps are dropped, a map which is still loading finishes and is then discarded
+            while len(self.maps) > self.max_maps:
+                self.maps.popitem(last=False)
+        return self.maps[key]
+
+    # the map's image and occupancy grid, waits only if the map was not prefetched or is still loading
+    def load(self, map_path, width, height, drone_radius):
+        future = self.prefetch(map_path, width, height, drone_radius)
+        self.maps.move_to_end((map_path, width, height, drone_radius))
+        try:
+            return future.result()
+        except Exception:
+            # a failed load is not kept, the next load tries again
+            del self.maps[(map_path, width, height, drone_radius)]
+            raise
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
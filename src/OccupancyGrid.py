@@ -0,0 +1,88 @@
+import numpy as np
+
+# OccupancyGrid class - the map as a NumPy array, 1 is an obstacle (black pixel) and 0 is free space (white pixel)
+class OccupancyGrid:
+    is_tiled = False  # a TiledOccupancyGrid is a map too large to hold whole, the structures built on it are kept sparse
+
+    def __init__(self, cells, max_clearance=32):
+        self.cells = cells  # uint8 array of shape (height, width)
+        self.height, self.width = cells.shape
+        self.max_clearance = max_clearance  # clearances are capped, a ray jumps at most this many pixels at once
+        self.clearance = None  # computed on the first ray cast
+        self.collision_masks = {}  # drone radius -> collision mask
+        self.free_positions = {}  # drone radius -> the pixels a drone can be placed on
+        self.free_cells_count = None
+
+    # thresholds the whole image in one vectorized operation
+    @classmethod
+    def from_image(cls, img, threshold=128):
+        bw_img = np.asarray(img.convert("L"))  # Convert to grayscale
+        return cls((bw_img < threshold).astype(np.uint8))
+
+    # map_matrix[y][x] indexing, like the list of rows the map used to be
+    def __getitem__(self, y):
+        return self.cells[y]
+
+    def __len__(self):
+        return self.height
+
+    def count_free_cells(self):
+        if self.free_cells_count is None:
+            self.free_cells_count = int(self.cells.size - np.count_nonzero(self.cells))
+        return self.free_cells_count
+
+    '''
+    the configuration space of a drone with the given radius: mask[y, x] is True if there is an obstacle in the box
+    of pixels [x - radius, x + radius) x [y - radius, y + radius) around it, computed once with a summed-area table.
+    '''
+    def get_collision_mask(self, radius):
+        if radius not in self.collision_masks:
+            summed = np.zeros((self.height + 1, self.width + 1), dtype=np.int32)
+            summed[1:, 1:] = self.cells.cumsum(axis=0, dtype=np.int32).cumsum(axis=1)
+            # the box around every pixel, cut to the map's borders
+            top = np.clip(np.arange(self.height) - radius, 0, self.height)[:, None]
+            bottom = np.clip(np.arange(self.height) + radius, 0, self.height)[:, None]
+            left = np.clip(np.arange(self.width) - radius, 0, self.width)[None, :]
+            right = np.clip(np.arange(self.width) + radius, 0, self.width)[None, :]
+            obstacles = summed[bottom, right] - summed[top, right] - summed[bottom, left] + summed[top, left]
+            self.collision_masks[radius] = obstacles > 0
+        return self.collision_masks[radius]
+
+    # True for every position (xs[i], ys[i]) where a drone with the given radius is inside the map and not collided
+    def are_positions_free(self, xs, ys, radius):
+        free = (radius <= xs) & (xs < self.width - radius) & (radius <= ys) & (ys < self.height - radius)
+        free[free] = ~self.get_collision_mask(radius)[ys[free].astype(np.int64), xs[free].astype(np.int64)]
+        return free
+
+    # the flat indexes (y * width + x) of the pixels where a drone with the given radius is inside the map and not collided
+    def get_free_positions(self, radius):
+        if radius not in self.free_positions:
+            allowed = ~self.get_collision_mask(radius)
+            # keep the drone inside the map, like the respawn bounds [radius, size - radius - 1]
+            allowed[:radius, :] = False
+            allowed[self.height - radius:, :] = False
+            allowed[:, :radius] = False
+            allowed[:, self.width - radius:] = False
+            self.free_positions[radius] = np.flatnonzero(allowed)
+        return self.free_positions[radius]
+
+    # the chessboard distance from every pixel to the nearest obstacle or to the outside of the map, capped at max_clearance
+    def get_clearance(self):
+        if self.clearance is None:
+            # one ring of obstacles around the map - leaving the map stops a ray just like an obstacle does
+            blocked = np.pad(self.cells.astype(bool), 1, constant_values=True)
+            clearance = np.full(blocked.shape, self.max_clearance, dtype=np.uint8)
+            clearance[blocked] = 0
+            # grow the obstacles by one pixel in all 8 directions per iteration
+            for distance in range(1, self.max_clearance):
+                grown = blocked.copy()
+                grown[1:, :] |= blocked[:-1, :]
+                grown[:-1, :] |= blocked[1:, :]
+                grown[:, 1:] |= grown[:, :-1].copy()
+                grown[:, :-1] |= grown[:, 1:].copy()
+                clearance[grown & ~blocked] = distance
+                blocked = grown
+                if blocked.all():
+                    break
+            self.clearance = clearance[1:-1, 1:-1]
+        return self.clearance
@@ -4,10 +4,11 @@ class OpticalFlow:
         self.max_speed = 3  # Maximum speed in meters per second
         self.current_speed = 0  # Current speed in meters per second
 
-    def update_speed_acceleration(self):
+    # scale is the length of the time the drone accelerates, in ticks of 60 Hz
+    def update_speed_acceleration(self, scale=1):
         # Update the speed based on acceleration until it reaches the maximum speed
         if self.current_speed < self.max_speed:
-            self.current_speed += self.acceleration
+            self.current_speed = min(self.current_speed + self.acceleration * scale, self.max_speed)
 
     def update_speed_deceleration(self):
         # Update the speed based on acceleration until it reaches 0
@@ -0,0 +1,58 @@
+import numpy as np
+
+# PIDBank class - the gains and state of many PID controllers as arrays, all updated with one vectorized call
+class PIDBank:
+    # the gains can be numbers (the same for all the controllers) or one value per controller
+    def __init__(self, controllers_count=1, p=0, i=0, d=0, max_i=0):
+        self.controllers_count = controllers_count
+        self.P = np.full(controllers_count, p, dtype=float)
+        self.I = np.full(controllers_count, i, dtype=float)
+        self.D = np.full(controllers_count, d, dtype=float)
+        self.max_i = np.full(controllers_count, max_i, dtype=float)
+        self.integral = np.zeros(controllers_count)
+        self.last_error = np.zeros(controllers_count)
+        self.first_run = np.ones(controllers_count, dtype=bool)
+        self.last_output = np.zeros(controllers_count)
+
+    # clamps like PIDController.constrain: above max_value gives max_value, else below min_value gives min_value
+    def constrain(self, values, max_values, min_values):
+        return np.where(values > max_values, max_values, np.where(values < min_values, min_values, values))
+
+    '''
+    PIDController.update of the controllers given by indexes (by default all of them), errors[k] is the error of
+    controller indexes[k]. returns the controllers' outputs.
+    '''
+    def update(self, errors, dt, indexes=None):
+        if indexes is None:
+            indexes = slice(None)
+        errors = np.asarray(errors, dtype=float)
+        last_error = np.where(self.first_run[indexes], errors, self.last_error[indexes])
+        self.first_run[indexes] = False
+
+        integral = self.integral[indexes] + self.I[indexes] * errors * dt
+        self.integral[indexes] = integral
+        diff = (errors - last_error) / dt if dt != 0 else 0
+        max_i = self.max_i[indexes]
+        const_integral = self.constrain(integral, max_i, -max_i)
+        control_out = self.P[indexes] * errors + self.D[indexes] * diff + const_integral
+        self.last_error[indexes] = errors
+        self.last_output[indexes] = control_out
+        return control_out
+
+    # update of the one controller index with a number error, without arrays - a Drone updates its controllers one
+    # at a time. the same steps in the same order, so both give the same outputs to the last bit
+    def update_one(self, index, error, dt):
+        if self.first_run[index]:
+            self.last_error[index] = error
+            self.first_run[index] = False
+
+        integral = self.integral.item(index) + self.I.item(index) * error * dt
+        self.integral[index] = integral
+        diff = (error - self.last_error.item(index)) / dt if dt != 0 else 0
+        max_i = self.max_i.item(index)
+        const_integral = max_i if integral > max_i else -max_i if integral < -max_i else integral
+        control_out = self.P.item(index) * error + self.D.item(index) * diff + const_integral
+        self.last_error[index] = error
+        self.last_output[index] = control_out
+        return control_out
+
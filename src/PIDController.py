@@ -1,12 +1,32 @@
+from PIDBank import PIDBank
+
+# an attribute of the controller which is stored in the bank, at the controller's index
+def bank_attribute(name, cast=float):
+    def get(self):
+        return cast(getattr(self.bank, name)[self.index])
+
+    def set(self, value):
+        getattr(self.bank, name)[self.index] = value
+    return property(get, set)
+
+# PIDController class - a view of one controller of a PIDBank, by default of a bank of its own
 class PIDController:
-    def __init__(self, p, i, d, max_i):
+    P = bank_attribute("P")
+    I = bank_attribute("I")
+    D = bank_attribute("D")
+    max_i = bank_attribute("max_i")
+    integral = bank_attribute("integral")
+    last_error = bank_attribute("last_error")
+    first_run = bank_attribute("first_run", bool)
+    last_output = bank_attribute("last_output")
+
+    def __init__(self, p, i, d, max_i, bank=None, index=0):
+        self.bank = bank if bank is not None else PIDBank()
+        self.index = index
         self.P = p
         self.I = i
         self.D = d
         self.max_i = max_i
-        self.integral = 0
-        self.last_error = 0
-        self.first_run = True
 
     def constrain(self, value, max_value, min_value):
         if value > max_value:
@@ -17,16 +37,7 @@ class PIDController:
             return value
 
     def update(self, error, dt):
-        if self.first_run:
-            self.last_error = error
-            self.first_run = False
-
-        self.integral += self.I * error * dt
-        diff = (error - self.last_error) / dt if dt != 0 else 0
-        const_integral = self.constrain(self.integral, self.max_i, -self.max_i)
-        control_out = self.P * error + self.D * diff + const_integral
-        self.last_error = error
-        return control_out
+        return self.bank.update_one(self.index, error, dt)
     
     def update_P_value(self,value):
         self.P += value
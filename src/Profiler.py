@@ -0,0 +1,87 @@
+import json
+import time
+
+# Profiler class - timing histograms and call counts per phase of the hot paths.
+# the methods are wrapped only while the profiler is enabled, so when it is off they run untouched
+class Profiler:
+    histogram_buckets = 24  # bucket i counts the calls which took less than 2^i microseconds (the last one counts the rest)
+
+    def __init__(self):
+        self.enabled = False
+        self.targets = []  # (object, method name, phase name)
+        self.stats = {}  # phase name -> {"calls", "total", "max", "histogram"}
+        self.shadowed = {}  # (id of object, method name) -> what the instance itself held under that name before wrapping
+
+    # registers a method of an object to be timed as a phase, by default named after the method
+    def register(self, obj, method_name, phase=None):
+        phase = phase or method_name
+        self.targets.append((obj, method_name, phase))
+        self.stats.setdefault(phase, {"calls": 0, "total": 0.0, "max": 0.0, "histogram": [0] * self.histogram_buckets})
+        if self.enabled:
+            self.wrap(obj, method_name, phase)
+
+    # shadows the method with a timed wrapper stored on the instance itself
+    def wrap(self, obj, method_name, phase):
+        method = getattr(obj, method_name)
+        self.shadowed[(id(obj), method_name)] = vars(obj).get(method_name)
+        stats = self.stats[phase]
+        histogram = stats["histogram"]
+        last_bucket = self.histogram_buckets - 1
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                stats["calls"] += 1
+                stats["total"] += elapsed
+                if elapsed > stats["max"]:
+                    stats["max"] = elapsed
+                histogram[min(int(elapsed * 1e6).bit_length(), last_bucket)] += 1
+        setattr(obj, method_name, timed)
+
+    def enable(self):
+        if not self.enabled:
+            self.enabled = True
+            for obj, method_name, phase in self.targets:
+                self.wrap(obj, method_name, phase)
+
+    def disable(self):
+        if self.enabled:
+            self.enabled = False
+            for obj, method_name, phase in self.targets:
+                shadowed = self.shadowed.pop((id(obj), method_name))
+                if shadowed is None:
+                    delattr(obj, method_name)  # the class's method is visible again
+                else:
+                    setattr(obj, method_name, shadowed)
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    # one line per phase: mean time per call and number of calls
+    def get_summary(self):
+        summary = {}
+        for phase, stats in self.stats.items():
+            mean = stats["total"] / stats["calls"] if stats["calls"] else 0
+            summary[phase] = f"{phase}: {mean * 1000:.3f} ms x {stats['calls']}"
+        return summary
+
+    def dump(self, path):
+        report = {}
+        for phase, stats in self.stats.items():
+            report[phase] = {
+                "calls": stats["calls"],
+                "total_seconds": stats["total"],
+                "mean_ms": stats["total"] / stats["calls"] * 1000 if stats["calls"] else 0,
+                "max_ms": stats["max"] * 1000,
+                # calls per bucket, keyed by the bucket's upper bound in microseconds
+                "histogram_us": {(f"<{2 ** i}" if i < self.histogram_buckets - 1 else f">={2 ** (i - 1)}"): count
+                                 for i, count in enumerate(stats["histogram"]) if count},
+            }
+        with open(path, "w") as report_file:
+            json.dump(report, report_file, indent=2)
@@ -0,0 +1,169 @@
+import pygame
+import math
+
+# PygameRenderer class - draws the simulation incrementally, only the regions of the screen which changed are redrawn
+class PygameRenderer:
+    legend_texts = [
+        "Controls Legend:",
+        "L: Show/Hide Legend",
+        "Arrow Keys: Move Drone",
+        "A/D: Rotate Drone",
+        "Q: Switch Wall",
+        "R: Reset Simulation",
+        "E: Toggle Autonomous Mode",
+        "W: Increase Speed",
+        "S: Decrease Speed",
+        "M: Change Map",
+        "F: Fast Forward x1/x2/x4/x8/x16",
+        "V: Show/Hide Rendering",
+        "P: Show/Hide Profiler"
+    ]
+    profile_texts_x = 300  # the profiler's texts are drawn in a column next to the sensor texts
+    legend_position = (50, 50)
+
+    def __init__(self, simulation):
+        self.simulation = simulation
+        self.screen = simulation.screen
+        # fonts and the legend never change, create them once
+        self.font = pygame.font.SysFont(None, 24)
+        self.legend_surface = self.create_legend_surface()
+        self.legend_rect = self.legend_surface.get_rect(topleft=self.legend_position)
+        self.text_surfaces = {}  # (column x, text key) -> (text, rendered surface)
+        self.texts_rect = None  # the region of the screen covered by the sensor and profiler texts
+        self.reset()
+
+    def create_legend_surface(self):
+        # Create a semi-transparent background for the legend
+        legend_surface = pygame.Surface((400, 20 + len(self.legend_texts) * 30))
+        legend_surface.set_alpha(200)  # Transparency
+        legend_surface.fill((50, 50, 50))
+
+        # Render the legend text
+        font = pygame.font.SysFont(None, 24, bold=True)
+        for i, text in enumerate(self.legend_texts):
+            text_surface = font.render(text, True, (255, 255, 255))
+            legend_surface.blit(text_surface, (10, 10 + i * 30))
+        return legend_surface
+
+    # throws away the persistent layers, called when the map changes or the simulation resets
+    def reset(self):
+        # the map with the detected (yellow) points painted on it, flattened onto black in the display's
+        # pixel format, so restoring a region is a plain copy instead of an alpha blend
+        self.background = pygame.Surface(self.simulation.map_img.get_size()).convert()
+        self.background.blit(self.simulation.map_img, (0, 0))
+        # the drone's trail, drawn over the background
+        self.trail_layer = pygame.Surface(self.background.get_size())
+        self.trail_layer.set_colorkey((0, 0, 0))  # Set transparent color
+        self.drawn_trail_length = 0
+        self.painted_rects = []  # regions of the background painted since the last frame
+        self.drone_rect = None  # where the drone was drawn in the last frame
+        self.show_legend = self.simulation.show_legend
+        self.full_redraw = True
+
+    # called after every simulation tick, the screen is updated on the next draw
+    def paint_detected_points(self, new_xs, new_ys):
+        if len(new_xs) == 0:
+            return
+        # Paint only the new points on the background
+        for x, y in zip(new_xs.tolist(), new_ys.tolist()):
+            self.background.set_at((x, y), (255, 255, 0))
+        left, top = int(new_xs.min()), int(new_ys.min())
+        self.painted_rects.append(pygame.Rect(left, top, int(new_xs.max()) - left + 1, int(new_ys.max()) - top + 1))
+
+    def draw_new_trail_points(self):
+        trail = self.simulation.drone_positions
+        dirty_rects = []
+        for i in range(self.drawn_trail_length, len(trail)):
+            dirty_rects.append(pygame.draw.circle(self.trail_layer, (0, 0, 255), trail[i], 2))
+        self.drawn_trail_length = len(trail)
+        return dirty_rects
+
+    def draw_drone(self, drone_pos):
+        # Draw arrow on the drone indicating its direction
+        angle_rad = math.radians(self.simulation.drone.orientation_sensor.drone_orientation)
+        end_x = drone_pos[0] + 15 * math.cos(angle_rad)
+        end_y = drone_pos[1] + 15 * math.sin(angle_rad)
+        arrow_rect = pygame.draw.line(self.screen, (0, 0, 0), drone_pos, (end_x, end_y), 2)
+
+        # Blit the drone onto the screen
+        drone_rect = pygame.draw.circle(self.screen, (255, 0, 0), drone_pos, self.simulation.drone_radius)
+        return drone_rect.union(arrow_rect)
+
+    # the columns of texts drawn over the map: (x, texts)
+    def get_text_columns(self):
+        return [(0, self.simulation.sensor_texts), (self.profile_texts_x, self.simulation.profile_texts)]
+
+    # renders the texts which changed, returns True if any did
+    def update_text_surfaces(self):
+        text_surfaces = {}
+        changed = False
+        for x, texts in self.get_text_columns():
+            for key, text in texts.items():
+                cached = self.text_surfaces.get((x, key))
+                if cached is None or cached[0] != text:
+                    cached = (text, self.font.render(text, True, (0, 204, 0)))
+                    changed = True
+                text_surfaces[(x, key)] = cached
+        # a text which was removed also changes the screen
+        changed = changed or len(text_surfaces) != len(self.text_surfaces)
+        self.text_surfaces = text_surfaces
+        return changed
+
+    def draw_sensor_texts(self):
+        texts_rect = None
+        for x, texts in self.get_text_columns():
+            for i, key in enumerate(texts):
+                text_rect = self.screen.blit(self.text_surfaces[(x, key)][1], (x, self.simulation.map_height - 15 - i * 30))
+                texts_rect = text_rect if texts_rect is None else texts_rect.union(text_rect)
+        return texts_rect
+
+    # restores the background and the trail of a region of the screen
+    def restore(self, rect):
+        self.screen.fill((0, 0, 0), rect)
+        self.screen.blit(self.background, rect, rect)
+        self.screen.blit(self.trail_layer, rect, rect)
+
+    def draw(self, drone_pos):
+        dirty_rects = self.painted_rects
+        self.painted_rects = []
+        dirty_rects.extend(self.draw_new_trail_points())
+        texts_changed = self.update_text_surfaces()
+
+        if self.full_redraw:
+            self.restore(self.screen.get_rect())
+            self.drone_rect = self.draw_drone(drone_pos)
+            self.texts_rect = self.draw_sensor_texts()
+            if self.show_legend:
+                self.screen.blit(self.legend_surface, self.legend_position)
+            pygame.display.update()
+            self.full_redraw = False
+            return
+
+        # the drone moves every frame, redraw where it was and where it is now
+        if self.drone_rect is not None:
+            dirty_rects.append(self.drone_rect)
+        drone_pos_rect = pygame.Rect(0, 0, 2 * 17, 2 * 17)
+        drone_pos_rect.center = (int(drone_pos[0]), int(drone_pos[1]))
+        dirty_rects.append(drone_pos_rect)
+
+        # the texts and the legend are drawn over the map, redraw them when something under them changed
+        if self.show_legend != self.simulation.show_legend:
+            self.show_legend = self.simulation.show_legend
+            dirty_rects.append(self.legend_rect)
+        redraw_texts = texts_changed or self.texts_rect.collidelist(dirty_rects) != -1
+        if redraw_texts:
+            dirty_rects.append(self.texts_rect)
+        redraw_legend = self.show_legend and self.legend_rect.collidelist(dirty_rects) != -1
+        if redraw_legend:
+            dirty_rects.append(self.legend_rect)
+
+        for rect in dirty_rects:
+            self.restore(rect)
+        self.drone_rect = self.draw_drone(drone_pos)
+        if redraw_texts:
+            # the texts can get wider or narrower
+            self.texts_rect = self.draw_sensor_texts()
+            dirty_rects.append(self.texts_rect)
+        if redraw_legend:
+            self.screen.blit(self.legend_surface, self.legend_position)
+        pygame.display.update(dirty_rects)
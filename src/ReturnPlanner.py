@@ -0,0 +1,81 @@
+import math
+import numpy as np
+
+'''
+ReturnPlanner class - plans the drone's way home as a shortcut of its trail: from the drone's position it flies
+straight to the farthest back trail point it can reach without a collision, then again from there, down to the
+trail's first point (the starting position).
+a plan is the list of positions the drone lands on in every tick, at most max_speed pixels apart, and every one of
+them is checked against the map's collision mask, so flying the plan never crashes.
+'''
+class ReturnPlanner:
+    def __init__(self, map_matrix, drone_radius, max_speed):
+        self.map_matrix = map_matrix
+        self.drone_radius = drone_radius
+        self.max_speed = max_speed  # pixels per tick
+
+    # the positions of the ticks of a straight flight from (x, y) to (to_x, to_y), which lands exactly on it
+    def get_segment_positions(self, x, y, to_x, to_y):
+        dx, dy = to_x - x, to_y - y
+        ticks = math.ceil(math.sqrt(dx * dx + dy * dy) / self.max_speed)
+        fractions = np.arange(1, ticks) / ticks
+        xs = np.append(x + dx * fractions, to_x)
+        ys = np.append(y + dy * fractions, to_y)
+        return xs, ys
+
+    def is_segment_free(self, x, y, to_x, to_y):
+        xs, ys = self.get_segment_positions(x, y, to_x, to_y)
+        return bool(self.map_matrix.are_positions_free(xs, ys, self.drone_radius).all())
+
+    '''
+    the farthest back trail point before index end which can be reached straight from (x, y). the candidates are
+    end - 1, end - 2, end - 4, ... until one can't be reached, then a binary search between the last two candidates.
+    returns None if not even the point end - 1 can be reached.
+    '''
+    def find_farthest_reachable(self, x, y, trail_xs, trail_ys, end):
+        def reachable(index):
+            return self.is_segment_free(x, y, trail_xs[index], trail_ys[index])
+
+        if not reachable(end - 1):
+            return None
+        reached, back = end - 1, 2
+        while reached > 0:
+            candidate = max(end - back, 0)
+            if not reachable(candidate):
+                break
+            reached = candidate
+            back *= 2
+        else:
+            return 0
+        missed = candidate
+        while reached - missed > 1:
+            middle = (reached + missed) // 2
+            if reachable(middle):
+                reached = middle
+            else:
+                missed = middle
+        return reached
+
+    # the positions of every tick of the flight from position back to the trail's first point, as [x, y] lists
+    def plan(self, position, trail_xs, trail_ys):
+        x, y = float(position[0]), float(position[1])
+        end = len(trail_xs)
+        # the drone is usually on the trail's last point when it starts returning
+        if end and trail_xs[end - 1] == x and trail_ys[end - 1] == y:
+            end -= 1
+        xs, ys = [], []
+        while end > 0:
+            index = self.find_farthest_reachable(x, y, trail_xs, trail_ys, end)
+            if index is None:
+                # no straight way to the trail, jump back onto it like retracing the trail did
+                index = end - 1
+                segment_xs, segment_ys = np.array([trail_xs[index]]), np.array([trail_ys[index]])
+            else:
+                segment_xs, segment_ys = self.get_segment_positions(x, y, trail_xs[index], trail_ys[index])
+            xs.append(segment_xs)
+            ys.append(segment_ys)
+            x, y = float(trail_xs[index]), float(trail_ys[index])
+            end = index
+        if not xs:
+            return []
+        return np.column_stack((np.concatenate(xs), np.concatenate(ys))).tolist()
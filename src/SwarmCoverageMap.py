@@ -0,0 +1,53 @@
+import numpy as np
+
+'''
+SwarmCoverageMap class - the coverage of many drones flying on the same map, each one with a CoverageMap of its own.
+the bitmaps are packed, one bit per pixel per drone: bit d * pixels_per_drone + y * width + x is drone d's pixel (x, y).
+'''
+class SwarmCoverageMap:
+    def __init__(self, map_matrix, drones_count, stamp_radius=2):
+        self.map_matrix = map_matrix
+        self.drones_count = drones_count
+        # rounded up to whole bytes, so clearing one drone's bitmap never touches another's
+        self.pixels_per_drone = (map_matrix.height * map_matrix.width + 7) // 8 * 8
+        self.covered = np.zeros(drones_count * self.pixels_per_drone // 8, dtype=np.uint8)
+        self.covered_counts = np.zeros(drones_count, dtype=np.int64)
+        # the offsets of all the pixels within stamp_radius around a point, like CoverageMap
+        offsets = [(dx, dy) for dx in range(-stamp_radius, stamp_radius + 1) for dy in range(-stamp_radius, stamp_radius + 1)
+                   if dx * dx + dy * dy <= stamp_radius * stamp_radius]
+        self.stamp_dx = np.array([dx for dx, dy in offsets])
+        self.stamp_dy = np.array([dy for dx, dy in offsets])
+
+    def is_covered(self, bits):
+        return (self.covered[bits >> 3] >> (bits & 7).astype(np.uint8)) & 1 == 1
+
+    '''
+    the same as CoverageMap.stamp for every drone at once: the point (xs[i], ys[i]) was seen by drone drones[i].
+    returns the number of pixels each drone newly covered.
+    '''
+    def stamp(self, drones, xs, ys):
+        width = self.map_matrix.width
+        not_covered = ~self.is_covered(drones * self.pixels_per_drone + ys * width + xs)
+        drones, xs, ys = drones[not_covered], xs[not_covered], ys[not_covered]
+        stamp_drones = np.repeat(drones, len(self.stamp_dx))
+        stamp_xs = (xs[:, None] + self.stamp_dx[None, :]).ravel()
+        stamp_ys = (ys[:, None] + self.stamp_dy[None, :]).ravel()
+        inside = (stamp_xs >= 0) & (stamp_xs < width) & (stamp_ys >= 0) & (stamp_ys < self.map_matrix.height)
+        stamp_drones, stamp_xs, stamp_ys = stamp_drones[inside], stamp_xs[inside], stamp_ys[inside]
+        bits = stamp_drones * self.pixels_per_drone + stamp_ys * width + stamp_xs
+        new = (self.map_matrix.cells[stamp_ys, stamp_xs] == 0) & ~self.is_covered(bits)
+        # a pixel can be in the stamps of a few points, count it once (sorting is much faster than np.unique's hashing here)
+        new_bits = np.sort(bits[new])
+        first = np.ones(len(new_bits), dtype=bool)
+        first[1:] = new_bits[1:] != new_bits[:-1]
+        new_bits = new_bits[first]
+        np.bitwise_or.at(self.covered, new_bits >> 3, (1 << (new_bits & 7)).astype(np.uint8))
+        new_counts = np.bincount(new_bits // self.pixels_per_drone, minlength=self.drones_count)
+        self.covered_counts += new_counts
+        return new_counts
+
+    def clear(self, drones):
+        bytes_per_drone = self.pixels_per_drone // 8
+        for drone in drones.tolist():
+            self.covered[drone * bytes_per_drone:(drone + 1) * bytes_per_drone] = 0
+        self.covered_counts[drones] = 0
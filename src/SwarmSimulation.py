@@ -0,0 +1,176 @@
+import argparse
+import csv
+import random
+import numpy as np
+from DroneSwarm import DroneSwarm
+from MapCache import MapCache
+from SwarmCoverageMap import SwarmCoverageMap
+
+'''
+SwarmSimulation class - many headless flights on the same map in lockstep, one drone per spawn seed.
+drone i flies exactly like HeadlessSimulation(map_path, seed=seeds[i]) - the drones do not see each other.
+'''
+class SwarmSimulation:
+    def __init__(self, map_path, seeds, map_width=1366, map_height=768, physics_rate=60, sensors_rate=10, pid_gains=None, map_cache=None):
+        self.map_width = map_width
+        self.map_height = map_height
+        self.physics_rate = physics_rate
+        self.sensors_rate = sensors_rate
+        self.physics_dt = 1 / physics_rate
+        self.seeds = list(seeds)
+        self.randoms = [random.Random(seed) for seed in self.seeds]  # one generator per drone, like HeadlessSimulation's
+
+        # simulated clock, advanced only by step()
+        self.ticks = 0
+        self.sensors_updates = 0
+        self.sim_time = 0
+
+        self.drone_radius = int(10 / 2.5)  # Convert cm to pixels
+        self.map_cache = map_cache if map_cache is not None else MapCache()
+        _, self.map_matrix = self.map_cache.load(map_path, map_width, map_height, self.drone_radius)
+        self.collision_mask = self.map_matrix.get_collision_mask(self.drone_radius)
+        self.total_white_pixels = self.map_matrix.count_free_cells()
+
+        drones_count = len(self.seeds)
+        self.swarm = DroneSwarm(drones_count, map_width, map_height, clock=self.get_sim_time, physics_dt=self.physics_dt,
+                                **(pid_gains or {}))
+        self.coverage = SwarmCoverageMap(self.map_matrix, drones_count)
+        self.crashes = np.zeros(drones_count, dtype=np.int64)
+        self.return_start_times = np.full(drones_count, np.nan)  # the simulated time each drone started returning home
+        self.flying = np.ones(drones_count, dtype=bool)  # the drones whose flight did not end yet
+        self.end_times = np.zeros(drones_count)
+
+        all_drones = np.arange(drones_count)
+        self.respawn_drones(all_drones)
+        self.swarm.set_starting_positions(all_drones)
+
+    def get_sim_time(self):
+        return self.sim_time
+
+    def respawn_drones(self, drones):
+        free_positions = self.map_matrix.get_free_positions(self.drone_radius)
+        for drone in drones.tolist():
+            position = int(free_positions[self.randoms[drone].randrange(len(free_positions))])
+            self.swarm.positions[drone] = [position % self.map_width, position // self.map_width]
+
+    # moves the drones whose new positions are inside the map and not collided, resets the others
+    def check_moves_legality(self, drones, new_positions):
+        xs, ys = new_positions[:, 0], new_positions[:, 1]
+        legal = ((self.drone_radius <= xs) & (xs < self.map_width - self.drone_radius) &
+                 (self.drone_radius <= ys) & (ys < self.map_height - self.drone_radius))
+        legal[legal] = ~self.collision_mask[ys[legal].astype(np.int64), xs[legal].astype(np.int64)]
+        moved = drones[legal]
+        self.swarm.positions[moved] = new_positions[legal]
+        self.swarm.update_positions(moved)  # Track the trails
+        crashed = drones[~legal]
+        self.crashes[crashed] += 1
+        self.reset_drones(crashed)
+
+    # marks the points seen by the left and right sensors of the drones as covered
+    def update_coverage(self, drones):
+        orientations = self.swarm.orientations[drones]
+        all_drones, all_xs, all_ys = [], [], []
+        for angle_offset, direction in ((-90, DroneSwarm.LEFTWARD), (90, DroneSwarm.RIGHTWARD)):
+            angles_rad = np.radians(np.mod(orientations + angle_offset, 360))
+            counts = (np.minimum(self.swarm.ranges[drones, direction], 300) / 2.5).astype(np.int64)
+            # the points 1, 2, ..., count pixels away along each drone's ray
+            dists = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+            xs = np.repeat(self.swarm.positions[drones, 0], counts) + dists * np.repeat(np.cos(angles_rad), counts)
+            ys = np.repeat(self.swarm.positions[drones, 1], counts) + dists * np.repeat(np.sin(angles_rad), counts)
+            ray_drones = np.repeat(drones, counts)
+            inside = (xs >= 0) & (xs < self.map_width) & (ys >= 0) & (ys < self.map_height)
+            xs, ys, ray_drones = xs[inside].astype(np.int64), ys[inside].astype(np.int64), ray_drones[inside]
+            free = self.map_matrix.cells[ys, xs] == 0  # Check if the point is in the white area
+            all_drones.append(ray_drones[free])
+            all_xs.append(xs[free])
+            all_ys.append(ys[free])
+        self.coverage.stamp(np.concatenate(all_drones), np.concatenate(all_xs), np.concatenate(all_ys))
+
+    def reset_drones(self, drones):
+        if len(drones) == 0:
+            return
+        self.coverage.clear(drones)
+        self.respawn_drones(drones)
+        self.swarm.speeds[drones] = 0
+        self.swarm.battery_ticks[drones] = self.swarm.amount_of_decisecond_drone_can_fly
+        self.swarm.battery_percentages[drones] = 100
+        #making the drones start flying
+        self.swarm.accelerate(drones)
+        #the drones start a new flight from the respawn point
+        self.swarm.returning_to_start[drones] = False
+        self.return_start_times[drones] = np.nan
+        self.swarm.set_starting_positions(drones)
+
+    # advances the flying drones by one physics tick of the simulated clock
+    def step(self):
+        drones = np.flatnonzero(self.flying)
+        # sensors are sampled at sensors_rate in simulated time, independently of the physics rate
+        if self.sensors_updates * self.physics_rate <= self.ticks * self.sensors_rate:
+            self.swarm.update_sensors(self.map_matrix, self.drone_radius, drones)
+            self.sensors_updates += 1
+
+        new_positions = self.swarm.update_positions_by_algorithm(drones, self.physics_dt)
+        started_return = drones[self.swarm.returning_to_start[drones] & np.isnan(self.return_start_times[drones])]
+        self.return_start_times[started_return] = self.sim_time
+        self.check_moves_legality(drones, new_positions)
+        self.update_coverage(drones)
+
+        self.ticks += 1
+        self.sim_time = self.ticks / self.physics_rate
+
+    # flies until every drone is back home, has an empty battery or max_time simulated seconds have passed
+    def run(self, max_time=480, stop_on_crash=False):
+        max_ticks = int(max_time * self.physics_rate)
+        #making the drones start flying
+        self.swarm.accelerate(np.arange(len(self.seeds)))
+        while self.ticks < max_ticks and self.flying.any():
+            self.step()
+            drones = np.flatnonzero(self.flying)
+            done = self.swarm.is_back_home()[drones] | (self.swarm.battery_percentages[drones] <= 0)
+            if stop_on_crash:
+                done |= self.crashes[drones] > 0
+            self.end_times[drones[done]] = self.sim_time
+            self.flying[drones[done]] = False
+        self.end_times[self.flying] = self.sim_time
+        return self.get_stats()
+
+    # one HeadlessSimulation.get_stats per drone, without the trail
+    def get_stats(self):
+        returned_home = self.swarm.is_back_home()
+        stats = []
+        for drone in range(len(self.seeds)):
+            stats.append({
+                "seed": self.seeds[drone],
+                "coverage": (int(self.coverage.covered_counts[drone]) / self.total_white_pixels) * 100,
+                "crashes": int(self.crashes[drone]),
+                "sim_time": float(self.end_times[drone]),
+                "returned_home": bool(returned_home[drone]),
+                "time_to_return": float(self.end_times[drone] - self.return_start_times[drone]) if returned_home[drone] else None,
+                "battery": float(self.swarm.battery_percentages[drone]),
+            })
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fly many headless flights on one map in lockstep, one per spawn seed")
+    parser.add_argument("map_path", help="path to the map image")
+    parser.add_argument("--drones", type=int, default=100, help="number of drones (spawn seeds)")
+    parser.add_argument("--first-seed", type=int, default=0, help="the seeds are first-seed, first-seed + 1, ...")
+    parser.add_argument("--max-time", type=float, default=480, help="maximum simulated flight time in seconds")
+    parser.add_argument("--output", default=None, help="write the results of every drone to this CSV file")
+    args = parser.parse_args()
+
+    simulation = SwarmSimulation(args.map_path, range(args.first_seed, args.first_seed + args.drones))
+    stats = simulation.run(max_time=args.max_time)
+    if args.output:
+        with open(args.output, "w", newline="") as results_file:
+            writer = csv.DictWriter(results_file, fieldnames=list(stats[0]))
+            writer.writeheader()
+            writer.writerows(stats)
+    coverages = [drone_stats["coverage"] for drone_stats in stats]
+    print(f"Coverage: mean {np.mean(coverages):.2f} %, min {min(coverages):.2f} %, max {max(coverages):.2f} %")
+    print(f"Crashes: {sum(drone_stats['crashes'] for drone_stats in stats)}")
+    print(f"Returned home: {sum(drone_stats['returned_home'] for drone_stats in stats)} of {len(stats)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import numpy as np
+
+'''
+SwarmTrail class - the trails of many drones, the trail of drone d is xs[d, :lengths[d]], ys[d, :lengths[d]].
+the trail points are also kept in a spatial index sorted by the key d * (width * height) + (y * width + x) of the
+pixel they are in, so the points near many query points are found with a few binary searches for all of them at once.
+new points wait in a small per drone buffer and become a new sorted run of the index when the buffer of any drone
+fills. a run is merged with the run before it once it is at least half its size, so the runs' sizes at least double
+from the newest to the oldest: there are O(log n) runs to search, and every point is merged O(log n) times over a
+flight instead of the whole index being copied at every merge.
+'''
+class SwarmTrail:
+    def __init__(self, drones_count, width, height, capacity=1024, buffer_size=64):
+        self.drones_count = drones_count
+        self.width = width
+        self.height = height
+        self.xs = np.empty((drones_count, capacity))
+        self.ys = np.empty((drones_count, capacity))
+        self.lengths = np.zeros(drones_count, dtype=np.int64)
+        self.cells_per_drone = width * height
+        # the spatial index: sorted runs of (key, x, y) of the indexed points, the oldest and largest run first
+        self.runs = []
+        # the points appended since the last merge: the places in the trail of the last buffer_counts[d] points of drone d
+        self.buffer_size = buffer_size
+        self.buffer_places = np.empty((drones_count, buffer_size), dtype=np.int64)
+        self.buffer_counts = np.zeros(drones_count, dtype=np.int64)
+
+    # appends one point to the trail of each drone in drones (the points must be inside the map)
+    def append(self, drones, xs, ys):
+        if len(drones) == 0:
+            return
+        # double the capacity when a trail is full, so appending stays O(1) amortized
+        if self.lengths[drones].max() == self.xs.shape[1]:
+            self.xs = np.concatenate((self.xs, np.empty(self.xs.shape)), axis=1)
+            self.ys = np.concatenate((self.ys, np.empty(self.ys.shape)), axis=1)
+        places = self.lengths[drones]
+        self.xs[drones, places] = xs
+        self.ys[drones, places] = ys
+        self.lengths[drones] += 1
+        self.buffer_places[drones, self.buffer_counts[drones]] = places
+        self.buffer_counts[drones] += 1
+        if self.buffer_counts[drones].max() == self.buffer_size:
+            self.merge_buffer()
+
+    def clear(self, drones):
+        if len(drones) == 0:
+            return
+        self.lengths[drones] = 0
+        self.buffer_counts[drones] = 0
+        runs = []
+        for keys, key_xs, key_ys in self.runs:
+            keep = ~np.isin(keys // self.cells_per_drone, drones)
+            if keep.any():
+                runs.append((keys[keep], key_xs[keep], key_ys[keep]))
+        self.runs = runs
+
+    def get_keys(self, drones, xs, ys):
+        return drones * self.cells_per_drone + ys.astype(np.int64) * self.width + xs.astype(np.int64)
+
+    # moves the buffered points into a new sorted run of the index
+    def merge_buffer(self):
+        buffered = np.arange(self.buffer_size)[None, :] < self.buffer_counts[:, None]
+        drones = np.nonzero(buffered)[0]
+        places = self.buffer_places[buffered]
+        xs, ys = self.xs[drones, places], self.ys[drones, places]
+        keys = self.get_keys(drones, xs, ys)
+        order = np.argsort(keys, kind="stable")
+        self.runs.append((keys[order], xs[order], ys[order]))
+        while len(self.runs) > 1 and 2 * len(self.runs[-1][0]) >= len(self.runs[-2][0]):
+            newer, older = self.runs.pop(), self.runs.pop()
+            keys, xs, ys = (np.concatenate((old, new)) for old, new in zip(older, newer))
+            # the stable sort of two sorted runs is a merge of them
+            order = np.argsort(keys, kind="stable")
+            self.runs.append((keys[order], xs[order], ys[order]))
+        self.buffer_counts[:] = 0
+
+    '''
+    for each drone in drones, checks if its trail has a point within radius of its point (xs, ys), with the same
+    distance computation as TrailIndex.has_point_within. returns a bool array.
+    '''
+    def has_point_within(self, drones, xs, ys, radius):
+        found = np.zeros(len(drones), dtype=bool)
+        if len(drones) == 0:
+            return found
+
+        def within(queries, point_xs, point_ys):
+            # ** 2 of python floats is the C library's pow, which float_power calls as well (x * x can round differently)
+            distances = np.sqrt(np.float_power(xs[queries] - point_xs, 2) + np.float_power(ys[queries] - point_ys, 2))
+            return distances <= radius
+
+        # the buffered points, the whole buffer of every drone is checked at once
+        buffered = np.arange(self.buffer_size)[None, :] < self.buffer_counts[drones, None]
+        queries, slots = np.nonzero(buffered)
+        places = self.buffer_places[drones[queries], slots]
+        hits = within(queries, self.xs[drones[queries], places], self.ys[drones[queries], places])
+        found[queries[hits]] = True
+
+        # the indexed points: the pixels at most cells_span away are a few ranges of consecutive keys, one per row,
+        # the ranges of every row of every query are searched at once in each run
+        cells_span = int(np.ceil(radius))
+        cell_xs = np.floor(xs).astype(np.int64)
+        cell_ys = np.floor(ys).astype(np.int64)
+        rows = np.arange(-cells_span, cells_span + 1)[:, None]
+        row_keys = (drones * self.cells_per_drone + (cell_ys + rows) * self.width + cell_xs).ravel()
+        row_queries = np.tile(np.arange(len(drones)), len(rows))
+        for keys, key_xs, key_ys in self.runs:
+            starts = np.searchsorted(keys, row_keys - cells_span, side="left")
+            ends = np.searchsorted(keys, row_keys + cells_span, side="right")
+            counts = ends - starts
+            if counts.sum() == 0:
+                continue
+            # a query outside the map reaches keys of other rows or drones, their points are too far to be within radius
+            queries = np.repeat(row_queries, counts)
+            candidates = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+            hits = within(queries, key_xs[candidates], key_ys[candidates])
+            found[queries[hits]] = True
+        return found
@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import json
+import socket
+import threading
+
+'''
+TelemetryServer class - streams the state of a flight after every tick to any number of subscribers over a local TCP
+socket, one JSON object per line.
+the simulation only stores its raw state in a ring buffer of capacity frames and advances a counter - no lock, no
+encoding and no I/O on the control path. an asyncio loop in a background thread encodes every frame once and sends it
+to every subscriber, each with its own position in the ring. a subscriber which reads slower than the flight falls
+behind, and the frames which were overwritten before it read them are dropped for it alone (its frames' ticks have a
+gap). the loop thread shares the GIL with the simulation: with no subscriber it only sleeps, with subscribers the
+encoding slows a headless flight which runs as fast as it can (measured on p11: about 25% fewer ticks per second with
+one subscriber, 45% with four), a live flight which waits for the display has the time to spare.
+'''
+class TelemetryServer:
+    def __init__(self, port=0, host="127.0.0.1", capacity=1024, poll_interval=0.01):
+        self.capacity = capacity
+        self.poll_interval = poll_interval  # seconds a subscriber which read everything waits for new frames
+        self.frames = [None] * capacity
+        self.encoded = [None] * capacity  # (frame number, the frame as a JSON line) of the frames encoded so far
+        self.published = 0  # the number of frames published so far, frame i is in frames[i % capacity]
+        self.subscribers = 0
+        self.loop = asyncio.new_event_loop()
+        # the socket is bound here, so the port is known (port 0 picks a free one) before the first frame
+        self.socket = socket.create_server((host, port))
+        self.port = self.socket.getsockname()[1]
+        self.server = None
+        self.started = threading.Event()  # set once the server accepts subscribers, close() waits for it
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(asyncio.start_server(self.handle_subscriber, sock=self.socket))
+        finally:
+            self.started.set()
+        self.loop.run_forever()
+        self.loop.close()
+
+    # stores the state of the simulation after its last tick, new_points are the x's and y's it newly covered
+    def publish(self, simulation, new_points):
+        drone = simulation.drone
+        self.frames[self.published % self.capacity] = (
+            simulation.ticks, simulation.sim_time, simulation.drone_pos[0], simulation.drone_pos[1],
+            drone.orientation_sensor.drone_orientation, drone.forward_distance_sensor.distance,
+            drone.backward_distance_sensor.distance, drone.leftward_distance_sensor.distance,
+            drone.rightward_distance_sensor.distance, drone.optical_flow_sensor.get_current_speed(),
+            drone.battery_sensor.get_battrey_precentage(), drone.returning_to_start, simulation.crashes,
+            simulation.calculate_yellow_percentage(), new_points)
+        self.published += 1  # the frame is complete before a subscriber can see it
+
+    @staticmethod
+    def encode(frame):
+        (tick, sim_time, x, y, orientation, forward, backward, leftward, rightward, speed, battery, returning, crashes,
+         coverage, (new_xs, new_ys)) = frame
+        return json.dumps({
+            "tick": tick, "time": sim_time, "x": float(x), "y": float(y), "orientation": orientation,
+            "forward": forward, "backward": backward, "leftward": leftward, "rightward": rightward,
+            "speed": speed, "battery": battery, "returning": returning, "crashes": crashes, "coverage": coverage,
+            "new_covered": [[int(new_x), int(new_y)] for new_x, new_y in zip(new_xs, new_ys)],
+        }).encode("utf-8") + b"\n"
+
+    # the frame as a JSON line, encoded once for all the subscribers
+    def get_encoded(self, index, frame):
+        entry = self.encoded[index % self.capacity]
+        if entry is None or entry[0] != index:
+            entry = (index, self.encode(frame))
+            self.encoded[index % self.capacity] = entry
+        return entry[1]
+
+    # sends the frames a subscriber did not get yet, from the oldest one still in the ring
+    async def handle_subscriber(self, reader, writer):
+        self.subscribers += 1
+        position = self.published  # a new subscriber starts from the next frame
+        try:
+            while True:
+                published = self.published
+                if position == published:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                position = max(position, published - self.capacity)
+                frames = [self.frames[index % self.capacity] for index in range(position, published)]
+                # the simulation may have overwritten the oldest frames while they were read, the oldest slot may be
+                # in the middle of being overwritten
+                overwritten = max(self.published - self.capacity + 1 - position, 0)
+                writer.write(b"".join(self.get_encoded(position + offset, frames[offset])
+                                      for offset in range(overwritten, len(frames))))
+                position = published
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.subscribers -= 1
+            writer.close()
+
+    # stops accepting subscribers, disconnects the ones connected and stops the loop thread
+    def close(self):
+        async def shutdown():
+            if self.server is not None:
+                self.server.close()
+            subscribers = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in subscribers:
+                task.cancel()
+            await asyncio.gather(*subscribers, return_exceptions=True)
+            if self.server is not None:
+                await self.server.wait_closed()
+            self.loop.stop()
+        # the loop runs the server only once started, stopping it earlier would interrupt the server's start
+        self.started.wait()
+        asyncio.run_coroutine_threadsafe(shutdown(), self.loop)
+        self.thread.join()
+
+
+# prints the frames of a running flight, a minimal subscriber
+def main():
+    parser = argparse.ArgumentParser(description="Print the telemetry of a flight which runs with --telemetry PORT")
+    parser.add_argument("port", type=int, help="the flight's telemetry port")
+    parser.add_argument("--host", default="127.0.0.1", help="the flight's host")
+    args = parser.parse_args()
+
+    with socket.create_connection((args.host, args.port)) as connection:
+        for line in connection.makefile("r", encoding="utf-8"):
+            print(line, end="")
+
+if __name__ == "__main__":
+    main()
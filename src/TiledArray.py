@@ -0,0 +1,129 @@
+import numpy as np
+
+'''
+TiledArray class - a 2D array of height x width stored in square tiles of tile_size x tile_size, as an array of
+shape (tiles_height, tiles_width, tile_size, tile_size). every tile is contiguous, so when the tiles are a memory-mapped
+file only the tiles which are read are loaded, and a small neighbourhood is a few tiles instead of a few pages of
+every row it crosses. the last row and column of tiles are padded past the array's borders.
+'''
+class TiledArray:
+    def __init__(self, tiles, width, height):
+        self.tiles = tiles
+        self.width = width
+        self.height = height
+        self.tile_size = tiles.shape[2]
+        self.shape = (height, width)
+        self.dtype = tiles.dtype
+
+    # the shape of the tiles of an array of height x width
+    @staticmethod
+    def get_tiles_shape(width, height, tile_size):
+        return ((height + tile_size - 1) // tile_size, (width + tile_size - 1) // tile_size, tile_size, tile_size)
+
+    @classmethod
+    def empty(cls, width, height, tile_size, dtype):
+        return cls(np.empty(cls.get_tiles_shape(width, height, tile_size), dtype=dtype), width, height)
+
+    '''
+    array[ys, xs] indexing with numbers or arrays of indexes, like a 2D array, and array[y] for a whole row.
+    the indexes must be inside the array, they are not checked.
+    '''
+    def __getitem__(self, key):
+        size = self.tile_size
+        if not isinstance(key, tuple):
+            return self.tiles[key // size, :, key % size, :].reshape(-1)[:self.width]
+        ys, xs = key
+        return self.tiles[ys // size, xs // size, ys % size, xs % size]
+
+    # the window of pixels [left, left + width) x [top, top + height) as a plain array, fill outside the array's borders
+    def read_window(self, left, top, width, height, fill):
+        window = np.full((height, width), fill, dtype=self.dtype)
+        size = self.tile_size
+        first_row, last_row = max(top, 0) // size, (min(top + height, self.height) - 1) // size
+        first_column, last_column = max(left, 0) // size, (min(left + width, self.width) - 1) // size
+        for tile_row in range(first_row, last_row + 1):
+            for tile_column in range(first_column, last_column + 1):
+                # the part of the tile inside both the window and the array
+                y0, y1 = max(tile_row * size, top, 0), min((tile_row + 1) * size, top + height, self.height)
+                x0, x1 = max(tile_column * size, left, 0), min((tile_column + 1) * size, left + width, self.width)
+                window[y0 - top:y1 - top, x0 - left:x1 - left] = self.tiles[tile_row, tile_column,
+                                                                            y0 - tile_row * size:y1 - tile_row * size,
+                                                                            x0 - tile_column * size:x1 - tile_column * size]
+        return window
+
+
+'''
+SparseTiledArray class - a 2D array of height x width in square tiles of tile_size, where only the tiles which were
+written are allocated. a tile which was never written reads as new_tile(tile_row, tile_column) returns it, so an
+array which is mostly untouched (like what one drone saw of a large map) costs only the tiles it touched.
+'''
+class SparseTiledArray:
+    def __init__(self, width, height, tile_size, dtype, new_tile):
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.shape = (height, width)
+        self.dtype = np.dtype(dtype)
+        self.tiles_width = (width + tile_size - 1) // tile_size
+        self.new_tile = new_tile
+        self.tiles = {}  # tile_row * tiles_width + tile_column -> tile
+
+    def get_tile(self, key, allocate=False):
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = self.new_tile(*divmod(key, self.tiles_width))
+            if allocate:
+                self.tiles[key] = tile
+        return tile
+
+    # the tiles of the indexes, as (the unique tiles, the position of every index's tile in the unique tiles)
+    def group_by_tile(self, ys, xs):
+        keys = (ys // self.tile_size) * self.tiles_width + xs // self.tile_size
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        return unique_keys.tolist(), inverse
+
+    # array[ys, xs] for arrays of indexes inside the array
+    def __getitem__(self, key):
+        ys, xs = (np.asarray(index) for index in key)
+        unique_keys, inverse = self.group_by_tile(ys, xs)
+        values = np.empty(ys.shape, dtype=self.dtype)
+        for position, tile_key in enumerate(unique_keys):
+            in_tile = inverse == position
+            values[in_tile] = self.get_tile(tile_key)[ys[in_tile] % self.tile_size, xs[in_tile] % self.tile_size]
+        return values
+
+    def __setitem__(self, key, values):
+        ys, xs = (np.asarray(index) for index in key)
+        values = np.broadcast_to(values, ys.shape)
+        unique_keys, inverse = self.group_by_tile(ys, xs)
+        for position, tile_key in enumerate(unique_keys):
+            in_tile = inverse == position
+            self.get_tile(tile_key, allocate=True)[ys[in_tile] % self.tile_size, xs[in_tile] % self.tile_size] = values[in_tile]
+
+    # the blocks of size x size (a divisor of tile_size) at the given block rows and columns, as an (n, size, size) array
+    def get_blocks(self, rows, columns, size):
+        per_tile = self.tile_size // size
+        blocks = []
+        for row, column in zip(np.asarray(rows).tolist(), np.asarray(columns).tolist()):
+            tile = self.get_tile((row // per_tile) * self.tiles_width + column // per_tile)
+            top, left = (row % per_tile) * size, (column % per_tile) * size
+            blocks.append(tile[top:top + size, left:left + size])
+        if not blocks:
+            return np.empty((0, size, size), dtype=self.dtype)
+        return np.stack(blocks)
+
+    # the window of pixels [left, left + width) x [top, top + height), which must be inside the array
+    def read_window(self, left, top, width, height):
+        window = np.empty((height, width), dtype=self.dtype)
+        size = self.tile_size
+        for tile_row in range(top // size, (top + height - 1) // size + 1):
+            for tile_column in range(left // size, (left + width - 1) // size + 1):
+                tile = self.get_tile(tile_row * self.tiles_width + tile_column)
+                y0, y1 = max(tile_row * size, top), min((tile_row + 1) * size, top + height)
+                x0, x1 = max(tile_column * size, left), min((tile_column + 1) * size, left + width)
+                window[y0 - top:y1 - top, x0 - left:x1 - left] = tile[y0 - tile_row * size:y1 - tile_row * size,
+                                                                      x0 - tile_column * size:x1 - tile_column * size]
+        return window
+
+    def clear(self):
+        self.tiles.clear()
@@ -0,0 +1,126 @@
+import numpy as np
+from OccupancyGrid import OccupancyGrid
+from TiledArray import TiledArray
+
+'''
+TiledOccupancyGrid class - an OccupancyGrid of a map at its native resolution, too large to hold in memory: the cells,
+the clearance field and the collision masks are TiledArrays, usually memory-mapped from the map cache, so only the
+tiles around the drone are loaded. the derived structures are computed one tile at a time, from a window of the
+cells around the tile which is large enough to give the same values as computing them on the whole map.
+the padding of the last tiles is outside the map, an obstacle in the cells.
+'''
+class TiledOccupancyGrid(OccupancyGrid):
+    is_tiled = True
+
+    def __init__(self, cells, max_clearance=32):
+        super().__init__(cells, max_clearance)  # cells is a TiledArray
+        self.tile_size = cells.tile_size
+        self.tiles_height, self.tiles_width = cells.tiles.shape[:2]
+        self.free_positions_counts = {}  # drone radius -> the number of positions a drone can be placed on in every tile
+
+    '''
+    thresholds the image into the tiles of the cells (an array of TiledArray.get_tiles_shape) one strip of tiles at
+    a time, every strip is cropped before it is converted to grayscale. PIL decodes a compressed image (PNG) whole
+    on the first crop, so the source image is in memory once while the cells are built, never its converted copies.
+    '''
+    @staticmethod
+    def fill_cells_from_image(tiles, img, threshold=128):
+        width, height = img.size
+        size = tiles.shape[2]
+        tiles[:] = 1
+        for tile_row in range(tiles.shape[0]):
+            strip = img.crop((0, tile_row * size, width, min((tile_row + 1) * size, height))).convert("L")  # Convert to grayscale
+            strip = np.asarray(strip) < threshold
+            for tile_column in range(tiles.shape[1]):
+                block = strip[:, tile_column * size:(tile_column + 1) * size]
+                tiles[tile_row, tile_column, :block.shape[0], :block.shape[1]] = block
+        return tiles
+
+    @classmethod
+    def from_image(cls, img, threshold=128, tile_size=256):
+        width, height = img.size
+        tiles = np.empty(TiledArray.get_tiles_shape(width, height, tile_size), dtype=np.uint8)
+        return cls(TiledArray(cls.fill_cells_from_image(tiles, img, threshold), width, height))
+
+    # map_matrix[y][x] indexing, like the list of rows the map used to be
+    def __getitem__(self, y):
+        return self.cells[y]
+
+    def count_free_cells(self):
+        if self.free_cells_count is None:
+            # the padding is an obstacle, it is not counted
+            self.free_cells_count = int(self.cells.tiles.size - np.count_nonzero(self.cells.tiles))
+        return self.free_cells_count
+
+    # computes every tile from the window of the cells around it, margin pixels on every side (outside the map is fill)
+    def fill_tiles(self, tiles, margin, fill, compute):
+        size = self.tile_size
+        for tile_row in range(self.tiles_height):
+            for tile_column in range(self.tiles_width):
+                window = self.cells.read_window(tile_column * size - margin, tile_row * size - margin,
+                                                size + 2 * margin, size + 2 * margin, fill)
+                tiles[tile_row, tile_column] = compute(OccupancyGrid(window, self.max_clearance))[margin:margin + size, margin:margin + size]
+        return tiles
+
+    # the clearance of a tile only depends on the obstacles up to max_clearance pixels away from it
+    def fill_clearance(self, tiles):
+        return self.fill_tiles(tiles, self.max_clearance, 1, OccupancyGrid.get_clearance)
+
+    # the collision mask of a tile only depends on the obstacles up to radius pixels away from it
+    def fill_collision_mask(self, radius, tiles):
+        return self.fill_tiles(tiles, radius, 0, lambda window: window.get_collision_mask(radius))
+
+    def get_clearance(self):
+        if self.clearance is None:
+            self.clearance = TiledArray(self.fill_clearance(np.empty(self.cells.tiles.shape, dtype=np.uint8)), self.width, self.height)
+        return self.clearance
+
+    def get_collision_mask(self, radius):
+        if radius not in self.collision_masks:
+            self.collision_masks[radius] = TiledArray(self.fill_collision_mask(radius, np.empty(self.cells.tiles.shape, dtype=bool)),
+                                                      self.width, self.height)
+        return self.collision_masks[radius]
+
+    # the pixels of a tile a drone with the given radius can be placed on, like OccupancyGrid.get_free_positions
+    def get_allowed_in_tile(self, radius, tile_row, tile_column):
+        size = self.tile_size
+        ys = np.arange(tile_row * size, (tile_row + 1) * size)[:, None]
+        xs = np.arange(tile_column * size, (tile_column + 1) * size)[None, :]
+        inside = (radius <= ys) & (ys < self.height - radius) & (radius <= xs) & (xs < self.width - radius)
+        return inside & ~self.get_collision_mask(radius).tiles[tile_row, tile_column]
+
+    # the number of free positions of a drone with the given radius in every tile, shape (tiles_height, tiles_width)
+    def count_free_positions(self, radius):
+        if radius not in self.free_positions_counts:
+            counts = np.zeros((self.tiles_height, self.tiles_width), dtype=np.int64)
+            for tile_row in range(self.tiles_height):
+                for tile_column in range(self.tiles_width):
+                    counts[tile_row, tile_column] = np.count_nonzero(self.get_allowed_in_tile(radius, tile_row, tile_column))
+            self.free_positions_counts[radius] = counts
+        return self.free_positions_counts[radius]
+
+    # the flat indexes (y * width + x) of the free positions, one tile after the other, read from the tiles on demand
+    def get_free_positions(self, radius):
+        if radius not in self.free_positions:
+            self.free_positions[radius] = TiledFreePositions(self, radius)
+        return self.free_positions[radius]
+
+
+# TiledFreePositions class - the free positions of a TiledOccupancyGrid, a sequence which reads only the tile of a position
+class TiledFreePositions:
+    def __init__(self, map_matrix, radius):
+        self.map_matrix = map_matrix
+        self.radius = radius
+        self.ends = np.cumsum(map_matrix.count_free_positions(radius).ravel())  # the end of every tile's positions
+
+    def __len__(self):
+        return int(self.ends[-1]) if len(self.ends) else 0
+
+    def __getitem__(self, index):
+        map_matrix = self.map_matrix
+        tile = int(np.searchsorted(self.ends, index, side="right"))
+        tile_row, tile_column = divmod(tile, map_matrix.tiles_width)
+        start = int(self.ends[tile - 1]) if tile else 0
+        position = int(np.flatnonzero(map_matrix.get_allowed_in_tile(self.radius, tile_row, tile_column))[index - start])
+        y, x = divmod(position, map_matrix.tile_size)
+        return (tile_row * map_matrix.tile_size + y) * map_matrix.width + tile_column * map_matrix.tile_size + x
@@ -0,0 +1,47 @@
+import numpy as np
+from TrailIndex import TrailIndex
+
+# Trail class - a growable list of [x, y] positions stored as two float arrays (x's and y's) instead of a list per position
+class Trail:
+    def __init__(self, capacity=1024, indexed=False):
+        self.xs = np.empty(capacity)
+        self.ys = np.empty(capacity)
+        self.length = 0
+        self.index = TrailIndex(self) if indexed else None  # spatial index for has_point_within
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.length
+        if not 0 <= i < self.length:
+            raise IndexError("trail index out of range")
+        return [float(self.xs[i]), float(self.ys[i])]
+
+    def __iter__(self):
+        for i in range(self.length):
+            yield [float(self.xs[i]), float(self.ys[i])]
+
+    def append(self, point):
+        # double the capacity when full, so appending stays O(1) amortized
+        if self.length == len(self.xs):
+            self.xs = np.concatenate((self.xs, np.empty(len(self.xs))))
+            self.ys = np.concatenate((self.ys, np.empty(len(self.ys))))
+        self.xs[self.length] = point[0]
+        self.ys[self.length] = point[1]
+        self.length += 1
+        if self.index is not None:
+            self.index.add(self.length - 1)
+
+    def clear(self):
+        self.length = 0
+        if self.index is not None:
+            self.index.clear()
+
+    def has_point_within(self, point, radius):
+        return self.index.has_point_within(point, radius)
+
+    # the trail's x's and y's as two arrays - views of the trail's storage, no copy is made
+    def to_numpy(self):
+        return self.xs[:self.length], self.ys[:self.length]
@@ -0,0 +1,31 @@
+import math
+
+# TrailIndex class - a grid hash of a Trail's points, finds trail points near a point without scanning the whole trail
+class TrailIndex:
+    def __init__(self, trail, cell_size=4.0):
+        self.trail = trail
+        self.cell_size = cell_size  # in pixels
+        self.cells = {}  # (cell_x, cell_y) -> the indexes of the trail points inside that cell, in the order they were added
+
+    def get_cell(self, x, y):
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def add(self, index):
+        cell = self.get_cell(self.trail.xs[index], self.trail.ys[index])
+        self.cells.setdefault(cell, []).append(index)
+
+    def clear(self):
+        self.cells.clear()
+
+    # checks only the cells which are at most radius away from the point's cell
+    def has_point_within(self, point, radius):
+        cell_x, cell_y = self.get_cell(point[0], point[1])
+        cells_span = math.ceil(radius / self.cell_size)
+        xs, ys = self.trail.xs, self.trail.ys
+        for x in range(cell_x - cells_span, cell_x + cells_span + 1):
+            for y in range(cell_y - cells_span, cell_y + cells_span + 1):
+                for index in self.cells.get((x, y), ()):
+                    distance = math.sqrt((point[0] - float(xs[index])) ** 2 + (point[1] - float(ys[index])) ** 2)
+                    if distance <= radius:
+                        return True
+        return False